@@ -1,24 +1,41 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app import models
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.services import user_cache_service
+from app.services.password_service import HasherBusy, hasher
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    try:
+        return await hasher.hash(password)
+    except HasherBusy:
+        raise _busy()
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+async def verify_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    # Returns (valid, new_hash); new_hash is set when the stored hash should
+    # be upgraded to the current BCRYPT_ROUNDS
+    try:
+        return await hasher.verify_and_update(plain, hashed)
+    except HasherBusy:
+        raise _busy()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -30,29 +47,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> models.User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or expired token",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _token_user_id(token: Optional[str]) -> int:
+    if not token:
+        raise _credentials_exception()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: int = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return int(user_id)
+
+
+def _cached_user(db: Session, snapshot: dict) -> models.User:
+    if not snapshot["is_active"]:
+        raise _credentials_exception()
+    return user_cache_service.attach(db, snapshot)
 
-    user = db.query(models.User).filter(models.User.id == int(user_id)).first()
+
+def _load_user(db: Session, user_id: int) -> models.User:
+    user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user or not user.is_active:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 
+def _user_from_token(token: Optional[str], db: Session) -> models.User:
+    user_id = _token_user_id(token)
+    # Hot users resolve from the cache with no DB round trip
+    snapshot = user_cache_service.get(user_id)
+    if snapshot is not None:
+        return _cached_user(db, snapshot)
+    user = _load_user(db, user_id)
+    user_cache_service.put(user)
+    return user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> models.User:
+    return _user_from_token(token, db)
+
+
+async def _user_from_token_async(token: Optional[str], db: AsyncSession) -> models.User:
+    # The cache is read outside run_sync so a Redis round trip never blocks
+    # the event loop
+    user_id = _token_user_id(token)
+    snapshot = await user_cache_service.get_async(user_id)
+    if snapshot is not None:
+        return await db.run_sync(_cached_user, snapshot)
+    user = await db.run_sync(_load_user, user_id)
+    await user_cache_service.put_async(user)
+    return user
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> models.User:
+    # For handlers on get_async_db: the user belongs to the same session
+    return await _user_from_token_async(token, db)
+
+
+async def get_stream_user_async(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+) -> models.User:
+    # EventSource can't set headers, so streams also accept ?access_token=
+    return await _user_from_token_async(token or access_token, db)
+
+
+async def require_admin_async(
+    current_user: models.User = Depends(get_current_user_async),
+) -> models.User:
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
+def is_admin_token(db: Session, token: str) -> bool:
+    # For middleware that must check a token outside dependency injection
+    try:
+        return bool(_user_from_token(token, db).is_admin)
+    except HTTPException:
+        return False
+
+
 def require_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
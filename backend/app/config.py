@@ -1,15 +1,152 @@
+from typing import List
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./marketing_reviewer.db"
+    # Run "alembic upgrade head" on startup. Off by default: migrate at
+    # deploy time so several app processes don't race to apply the same one.
+    DB_AUTO_MIGRATE: bool = False
+    # "tuned" applies the settings below; "default" leaves driver defaults
+    # (kept for comparison benchmarks)
+    DB_PROFILE: str = "tuned"
+    # SQLite: WAL lets readers run alongside the single writer, and writers
+    # wait up to BUSY_TIMEOUT for the lock instead of failing "database is locked"
+    DB_SQLITE_JOURNAL_MODE: str = "WAL"
+    DB_SQLITE_SYNCHRONOUS: str = "NORMAL"
+    DB_SQLITE_BUSY_TIMEOUT_MS: int = 10000
+    DB_SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    DB_SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    # Postgres: per engine; the sync and async engines each keep a pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
     SECRET_KEY: str = "change-this-secret-key-in-production-use-openssl-rand-hex-32"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
 
+    # bcrypt runs in its own process pool (0 workers = one background thread);
+    # beyond MAX_PENDING queued hashes, sign-ins get a 503. Existing hashes are
+    # rehashed to BCRYPT_ROUNDS (up or down) on the next successful login.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Resolved-user cache for get_current_user; set USER_CACHE_URL (redis://...)
+    # to share it across workers so invalidations apply everywhere at once
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_URL: str = ""
+
+    # Dashboard aggregates are cached per user for this long (0 disables);
+    # a miss scans every completed review in the user's scope
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 10000
+
     ANTHROPIC_API_KEY: str = ""
+    ANTHROPIC_MODEL: str = "claude-opus-4-6"
+    # Small model used to repair output that fails to parse
+    ANTHROPIC_REPAIR_MODEL: str = "claude-haiku-4-5"
+    ANTHROPIC_BASE_URL: str = "https://api.anthropic.com"
+
+    # Model routing: the first rule whose conditions all match picks the model,
+    # thinking ("adaptive", "off" or a token budget) and max_tokens; unset
+    # values fall back to ANTHROPIC_MODEL / adaptive / 4096. Conditions:
+    # content_types, sources, priorities (lists), min_chars, max_chars.
+    # Rules with "escalate" re-run on ANTHROPIC_MODEL when the result has
+    # confidence below ESCALATION_MIN_CONFIDENCE or a high-severity flag.
+    ANALYSIS_ROUTES: List[dict] = [
+        {"name": "high_priority", "priorities": ["high"]},
+        {
+            "name": "short_form",
+            "content_types": ["social_media", "ad_copy"],
+            "max_chars": 1000,
+            "model": "claude-haiku-4-5",
+            "thinking": "off",
+            "max_tokens": 2048,
+            "escalate": True,
+        },
+    ]
+    ESCALATION_MIN_CONFIDENCE: float = 0.6
+
+    # Content longer than the threshold is split on paragraph/heading
+    # boundaries into chunks of at most LONG_CONTENT_CHUNK_CHARS, analysed
+    # concurrently and merged
+    LONG_CONTENT_THRESHOLD_CHARS: int = 12000
+    LONG_CONTENT_CHUNK_CHARS: int = 6000
+    LONG_CONTENT_MAX_PARALLEL: int = 4
     SLACK_BOT_TOKEN: str = ""
     NOTION_API_KEY: str = ""
+    SLACK_BASE_URL: str = "https://slack.com/api/"
+    SLACK_SYNC_MAX_MESSAGES: int = 5000  # per channel per incremental sync
+    NOTION_BASE_URL: str = "https://api.notion.com"
+    NOTION_MAX_CONCURRENCY: int = 3
+    NOTION_REQUESTS_PER_SECOND: float = 3.0
+    NOTION_MAX_BLOCK_DEPTH: int = 8
+    NOTION_SYNC_MAX_PAGES: int = 500  # per database per incremental sync
+
+    # Shared Anthropic HTTP client (one pool per process)
+    ANTHROPIC_MAX_CONNECTIONS: int = 100
+    ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    ANTHROPIC_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    ANTHROPIC_CONNECT_TIMEOUT: float = 10.0  # seconds
+    ANTHROPIC_TIMEOUT: float = 600.0  # seconds, read/write/pool
+
+    # Brand guidelines are held in memory and re-read at most this often
+    GUIDELINES_REFRESH_SECONDS: float = 30.0
+
+    # POST /api/reviews/batch
+    REVIEW_BATCH_MAX_ITEMS: int = 500
+
+    # Server-Sent Events: keepalive interval; also how often a stream re-checks
+    # the DB for reviews analysed by another process
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+
+    # Analysis job queue / worker
+    WORKER_ENABLED: bool = True
+    WORKER_CONCURRENCY: int = 8  # concurrent analyses per process
+    WORKER_POLL_INTERVAL: float = 1.0  # seconds
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY_SECONDS: float = 30.0  # doubled on each transient failure
+
+    # Outbound Anthropic limits. 0 disables a limit. Without LLM_LIMITER_URL
+    # (redis://...) each process enforces them, and NOTION_REQUESTS_PER_SECOND,
+    # on its own.
+    ANTHROPIC_REQUESTS_PER_MINUTE: int = 0
+    ANTHROPIC_INPUT_TOKENS_PER_MINUTE: int = 0
+    LLM_LIMITER_URL: str = ""
+    LLM_MAX_RETRIES: int = 4  # per call, for 429/529/5xx and network errors
+    LLM_RETRY_BASE_DELAY: float = 1.0  # seconds
+    LLM_RETRY_MAX_DELAY: float = 60.0  # seconds
+    # Consecutive transient failures before the worker stops claiming jobs
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_OPEN_SECONDS: float = 30.0
+
+    # Message Batches bulk import mode
+    BATCH_POLL_INTERVAL: float = 60.0  # seconds between batch status checks
+    BATCH_LEASE_SECONDS: int = 600
+
+    # Analysis result cache
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 50000
+
+    # On-demand profiler: admins send "X-Profile: 1" on an /api request, or a
+    # share of requests is sampled; off entirely unless enabled
+    PROFILER_ENABLED: bool = False
+    PROFILER_SAMPLE_RATE: float = 0.0
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_MAX_SECONDS: float = 30.0
+    PROFILER_MAX_PROFILES: int = 50
+    PROFILER_MAX_QUERIES: int = 1000
+
+    # Prometheus /metrics endpoint (unauthenticated; restrict at the proxy)
+    METRICS_ENABLED: bool = True
 
     # CORS origins (comma-separated in env)
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:8000"
@@ -1,18 +1,107 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-    if settings.DATABASE_URL.startswith("sqlite")
-    else {},
-)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def engine_options(url: str) -> dict:
+    # create_engine / create_async_engine keyword arguments for DB_PROFILE
+    parsed = make_url(url)
+    backend, driver = parsed.get_backend_name(), parsed.get_driver_name()
+    options = {"connect_args": {"check_same_thread": False}} if driver == "pysqlite" else {}
+    if driver == "aiosqlite" and parsed.database not in (None, "", ":memory:"):
+        # SQLAlchemy defaults aiosqlite files to NullPool, which opens a
+        # connection (its own thread, plus the pragmas) for every session;
+        # pool them like the sync engine does
+        options["poolclass"] = AsyncAdaptedQueuePool
+    if settings.DB_PROFILE != "tuned" or backend != "postgresql":
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = (
+            {"server_settings": {"statement_timeout": timeout}}
+            if driver == "asyncpg"
+            else {"options": f"-c statement_timeout={timeout}"}
+        )
+    return options
+
+
+def tune_sqlite(engine) -> None:
+    # Pragmas are per connection, so they are applied as each one opens
+    if engine.dialect.name != "sqlite":
+        return
+    tuned = settings.DB_PROFILE == "tuned"
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # Not tuning: without it SQLite ignores ON DELETE CASCADE
+            # (analysis_jobs.review_id), whatever the profile
+            cursor.execute("PRAGMA foreign_keys = ON")
+            if not tuned:
+                return
+            cursor.execute(f"PRAGMA busy_timeout = {int(settings.DB_SQLITE_BUSY_TIMEOUT_MS)}")
+            if settings.DB_SQLITE_JOURNAL_MODE:
+                cursor.execute(f"PRAGMA journal_mode = {settings.DB_SQLITE_JOURNAL_MODE}")
+            if settings.DB_SQLITE_SYNCHRONOUS:
+                cursor.execute(f"PRAGMA synchronous = {settings.DB_SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA mmap_size = {int(settings.DB_SQLITE_MMAP_SIZE)}")
+            # Negative means KiB rather than pages
+            cursor.execute(f"PRAGMA cache_size = {-int(settings.DB_SQLITE_CACHE_SIZE_KB)}")
+        finally:
+            cursor.close()
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+tune_sqlite(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def async_database_url(url: str) -> str:
+    # Same database through the asyncio drivers: aiosqlite and asyncpg
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend == "postgresql":
+        query = dict(parsed.query)
+        # asyncpg spells libpq's sslmode as ssl
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(
+            hide_password=False
+        )
+    return url
+
+
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **engine_options(async_database_url(settings.DATABASE_URL)),
+)
+tune_sqlite(async_engine.sync_engine)
+
+# expire_on_commit=False: attributes stay readable after commit, since an
+# expired attribute can't lazy-load outside of await
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -21,6 +110,59 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def run_with_async_session(fn, *args):
+    # Runs sync service code (fn(db, *args)) on an async session: queries go
+    # through the async driver, so no thread is tied up waiting on the database
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(fn, *args)
+
+
+def run_with_session(fn, *args):
+    # For worker code that hands short DB operations to a thread
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def migrate(revision: str = "head") -> None:
+    from alembic import command
+
+    command.upgrade(_alembic_config(), revision)
+
+
 def init_db():
-    from app import models  # noqa: F401
-    Base.metadata.create_all(bind=engine)
+    # The schema is owned by migrations; startup only applies them when
+    # DB_AUTO_MIGRATE is set, and otherwise refuses to start on a database
+    # that is behind (the worker and routers would fail on missing columns)
+    if settings.DB_AUTO_MIGRATE:
+        migrate()
+        return
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    head = ScriptDirectory.from_config(_alembic_config()).get_current_head()
+    with engine.connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}: run `alembic upgrade head` "
+            "from backend/ or set DB_AUTO_MIGRATE=true (see alembic.ini for databases created "
+            "before migrations)"
+        )
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    # Leave the app's logging configuration alone
+    config.attributes["configure_logging"] = False
+    return config
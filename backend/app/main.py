@@ -1,14 +1,44 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 import os
 
+from app.auth import is_admin_token
 from app.config import settings
-from app.database import init_db
-from app.routers import auth, reviews, settings as settings_router, integrations, dashboard
+from app.database import SessionLocal, async_engine, engine, init_db, run_with_async_session
+from app.routers import auth, reviews, settings as settings_router, integrations, dashboard, profiles
+from app.services import (
+    batch_service, claude_service, metrics_service, password_service, profiler_service,
+    queue_service,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    claude_service.init_client()
+    password_service.hasher.start()
+    db = SessionLocal()
+    try:
+        queue_service.requeue_pending_reviews(db)
+    finally:
+        db.close()
+    if settings.WORKER_ENABLED:
+        await queue_service.worker.start()
+        await batch_service.poller.start()
+    yield
+    await batch_service.poller.stop()
+    await queue_service.worker.stop()
+    await batch_service.close_client()
+    await claude_service.close_client()
+    password_service.hasher.stop()
+    await async_engine.dispose()
 
-app = FastAPI(title="Marketing Reviewer", version="1.0.0")
+
+app = FastAPI(title="Marketing Reviewer", version="1.0.0", lifespan=lifespan)
 
 # CORS
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",")]
@@ -18,8 +48,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+if settings.METRICS_ENABLED:
+    @app.middleware("http")
+    async def record_latency(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Label by route template so /api/reviews/{review_id} is one series
+            route = request.scope.get("route")
+            metrics_service.HTTP_LATENCY.labels(
+                request.method, getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        body, content_type = metrics_service.render()
+        return Response(body, media_type=content_type)
+
+
+if settings.PROFILER_ENABLED:
+    async def _authorize_profile(token: str) -> bool:
+        return await run_with_async_session(is_admin_token, token)
+
+    profiler_service.instrument(engine)
+    profiler_service.instrument(async_engine.sync_engine)
+    app.add_middleware(profiler_service.ProfilerMiddleware, authorize=_authorize_profile)
+    app.include_router(profiles.router)
+
+
 # API routes
 app.include_router(auth.router)
 app.include_router(reviews.router)
@@ -37,8 +100,3 @@ if os.path.isdir(STATIC_DIR):
     async def serve_spa(full_path: str):
         index = os.path.join(STATIC_DIR, "index.html")
         return FileResponse(index)
-
-
-@app.on_event("startup")
-def on_startup():
-    init_db()
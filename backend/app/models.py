@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Text, Float, Boolean,
-    DateTime, JSON, ForeignKey
+    DateTime, JSON, ForeignKey, Index, text
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
@@ -20,6 +20,7 @@ class User(Base):
     full_name = Column(String, default="")
     is_admin = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
+    priority = Column(String, default="normal", server_default="normal")  # low, normal, high — used for routing and queue order
     created_at = Column(DateTime, default=utcnow)
 
     reviews = relationship("Review", back_populates="user")
@@ -30,12 +31,27 @@ class BrandGuidelines(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, default="")
+    version = Column(Integer, default=1, server_default="1", nullable=False)  # bumped on every update
     updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     updated_by = Column(Integer, ForeignKey("users.id"), nullable=True)
 
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # Keyset pagination of a user's reviews by (created_at, id)
+        Index("ix_reviews_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Added by migration 0003; see there for the queries each one serves
+        Index("ix_reviews_created_at_id", "created_at", "id"),
+        Index("ix_reviews_status_created_at", "status", "created_at"),
+        Index("ix_reviews_source_source_reference", "source", "source_reference"),
+        Index("ix_reviews_content_type", "content_type"),
+        Index(
+            "ix_reviews_pending_created_at", "created_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -45,6 +61,7 @@ class Review(Base):
     original_content = Column(Text, nullable=False)
     source = Column(String, default="manual")  # manual, slack, notion
     source_reference = Column(String, nullable=True)  # e.g. Slack message ID
+    content_hash = Column(String(64), nullable=True)  # sha256 of normalized content
 
     # Analysis results
     brand_score = Column(Float, nullable=True)
@@ -60,10 +77,85 @@ class Review(Base):
     # Status
     status = Column(String, default="pending")  # pending, completed, error
     error_message = Column(Text, nullable=True)
+    batch_id = Column(Integer, ForeignKey("analysis_batches.id", name="fk_reviews_batch_id"), nullable=True)
+    import_id = Column(String(32), nullable=True, index=True)  # groups one batch/import request
+    guidelines_version = Column(Integer, nullable=True)  # version the review was scored against
+
+    # Routing: which rule and model produced the result, and how long it took
+    analysis_model = Column(String, nullable=True)
+    analysis_route = Column(String, nullable=True)  # rule name, or "cache"
+    analysis_latency_ms = Column(Integer, nullable=True)
+    analysis_escalated = Column(Boolean, default=False)
+
+    # Anthropic usage summed over every call for this review
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    cache_read_input_tokens = Column(Integer, nullable=True)
+    cache_creation_input_tokens = Column(Integer, nullable=True)
 
     created_at = Column(DateTime, default=utcnow)
 
     user = relationship("User", back_populates="reviews")
+    jobs = relationship("AnalysisJob", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        # One live job per review (migration 0005); enqueue skips duplicates
+        Index(
+            "uq_analysis_jobs_live_review_id", "review_id", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    review_id = Column(Integer, ForeignKey("reviews.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String, default="queued", index=True)  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    bypass_cache = Column(Boolean, default=False)
+    priority = Column(Integer, default=0)  # higher is claimed first
+    available_at = Column(DateTime, nullable=True)  # retry backoff: not claimable before this
+
+    # Lease: the claiming worker owns the job until lease_expires_at; the
+    # token fences out a worker whose lease expired and was re-claimed.
+    worker_id = Column(String, nullable=True)
+    lease_token = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+
+class AnalysisBatch(Base):
+    __tablename__ = "analysis_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider_batch_id = Column(String, nullable=False, unique=True)
+    status = Column(String, default="submitted", index=True)  # submitted, ended, failed
+    request_count = Column(Integer, default=0)
+    # Guidelines the batch was submitted with, for stamping and caching results
+    guidelines_version = Column(Integer, nullable=True)
+    guidelines_digest = Column(String(64), nullable=True)
+    # Only one poller collects a batch's results at a time
+    locked_until = Column(DateTime, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utcnow)
+    ended_at = Column(DateTime, nullable=True)
+
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+
+    # sha256 of normalized content, content type, brand guidelines and model
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=utcnow, index=True)
+    last_used_at = Column(DateTime, default=utcnow, index=True)
 
 
 class IntegrationConfig(Base):
@@ -1,129 +1,149 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app import models, schemas
+from app.services import user_cache_service
 from app.auth import (
     hash_password, verify_password, create_access_token,
-    get_current_user, require_admin
+    get_current_user_async, require_admin_async
 )
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
+async def _user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+
 @router.post("/register", response_model=schemas.Token)
-def register(payload: schemas.UserCreate, db: Session = Depends(get_db)):
-    if db.query(models.User).filter(models.User.email == payload.email).first():
+async def register(payload: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    # Async session: these handlers await the password hasher, so a sync
+    # session here would block the event loop on every query
+    if await _user_by_email(db, payload.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # First user becomes admin
-    is_first_user = db.query(models.User).count() == 0
+    is_first_user = await db.scalar(select(func.count()).select_from(models.User)) == 0
 
     user = models.User(
         email=payload.email,
-        hashed_password=hash_password(payload.password),
+        hashed_password=await hash_password(payload.password),
         full_name=payload.full_name,
         is_admin=is_first_user,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     token = create_access_token({"sub": str(user.id)})
     return {"access_token": token, "token_type": "bearer", "user": user}
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(payload: schemas.LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.hashed_password):
+async def login(payload: schemas.LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await _user_by_email(db, payload.email)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    valid, new_hash = await verify_password(payload.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Account is disabled")
+    if new_hash:
+        # Upgrade hashes made with an older BCRYPT_ROUNDS on the next sign-in
+        user.hashed_password = new_hash
+        await db.commit()
 
     token = create_access_token({"sub": str(user.id)})
     return {"access_token": token, "token_type": "bearer", "user": user}
 
 
 @router.get("/me", response_model=schemas.UserOut)
-def get_me(current_user: models.User = Depends(get_current_user)):
+async def get_me(current_user: models.User = Depends(get_current_user_async)):
     return current_user
 
 
 @router.put("/me", response_model=schemas.UserOut)
-def update_me(
+async def update_me(
     payload: schemas.UserUpdate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     if payload.full_name is not None:
         current_user.full_name = payload.full_name
     if payload.password is not None:
-        current_user.hashed_password = hash_password(payload.password)
-    db.commit()
-    db.refresh(current_user)
+        current_user.hashed_password = await hash_password(payload.password)
+    await db.commit()
+    user_cache_service.invalidate(current_user.id)
+    await db.refresh(current_user)
     return current_user
 
 
 # ── Admin: user management ────────────────────────────────────────────────────
 
 @router.get("/users", response_model=list[schemas.UserOut])
-def list_users(
-    admin: models.User = Depends(require_admin),
-    db: Session = Depends(get_db),
+async def list_users(
+    admin: models.User = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return db.query(models.User).order_by(models.User.created_at).all()
+    return (await db.scalars(select(models.User).order_by(models.User.created_at))).all()
 
 
 @router.post("/users", response_model=schemas.UserOut, status_code=201)
-def create_user(
+async def create_user(
     payload: schemas.UserCreate,
-    admin: models.User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    admin: models.User = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    if db.query(models.User).filter(models.User.email == payload.email).first():
+    if await _user_by_email(db, payload.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     user = models.User(
         email=payload.email,
-        hashed_password=hash_password(payload.password),
+        hashed_password=await hash_password(payload.password),
         full_name=payload.full_name,
         is_admin=False,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.put("/users/{user_id}", response_model=schemas.UserOut)
-def update_user(
+async def update_user(
     user_id: int,
-    payload: schemas.UserUpdate,
-    admin: models.User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    payload: schemas.AdminUserUpdate,
+    admin: models.User = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if payload.full_name is not None:
         user.full_name = payload.full_name
     if payload.password is not None:
-        user.hashed_password = hash_password(payload.password)
-    db.commit()
-    db.refresh(user)
+        user.hashed_password = await hash_password(payload.password)
+    if payload.priority is not None:
+        user.priority = payload.priority
+    await db.commit()
+    user_cache_service.invalidate(user.id)
+    await db.refresh(user)
     return user
 
 
 @router.delete("/users/{user_id}", status_code=204)
-def deactivate_user(
+async def deactivate_user(
     user_id: int,
-    admin: models.User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    admin: models.User = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.id == admin.id:
         raise HTTPException(status_code=400, detail="Cannot deactivate yourself")
     user.is_active = False
-    db.commit()
+    await db.commit()
+    user_cache_service.invalidate(user.id)
@@ -1,66 +1,116 @@
 from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, text
 from collections import Counter
-from app.database import get_db
+from typing import Optional
+from app.database import get_async_db
 from app import models, schemas
-from app.auth import get_current_user
+from app.auth import get_current_user_async
+from app.services import dashboard_cache_service, review_service
 from datetime import datetime, timedelta, timezone
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+Review = models.Review
+
+
+def _top_issues(db: Session, user_id, limit: int = 5) -> list:
+    scope = "AND user_id = :user_id" if user_id is not None else ""
+    params = {"user_id": user_id, "limit": limit}
+    dialect = db.get_bind().dialect.name
+
+    # Unnest the JSON flags in the database so no review rows are hydrated.
+    # Ties are broken by issue text so equal counts list the same way on
+    # every dialect and every request.
+    if dialect == "sqlite":
+        sql = f"""
+            SELECT substr(coalesce(json_extract(flag.value, '$.issue'), ''), 1, 80) AS issue, COUNT(*) AS n
+            FROM reviews, json_each(reviews.compliance_flags) AS flag
+            WHERE reviews.status = 'completed' {scope}
+            GROUP BY issue ORDER BY n DESC, issue LIMIT :limit
+        """
+    elif dialect == "postgresql":
+        sql = f"""
+            SELECT left(coalesce(flag ->> 'issue', ''), 80) AS issue, COUNT(*) AS n
+            FROM reviews, json_array_elements(
+                CASE WHEN json_typeof(reviews.compliance_flags) = 'array'
+                     THEN reviews.compliance_flags ELSE '[]'::json END
+            ) AS flag
+            WHERE reviews.status = 'completed' {scope}
+            GROUP BY issue ORDER BY n DESC, issue LIMIT :limit
+        """
+    else:
+        # Other backends: stream just the flags column
+        query = db.query(Review.compliance_flags).filter(Review.status == "completed")
+        if user_id is not None:
+            query = query.filter(Review.user_id == user_id)
+        counts = Counter(
+            (flag.get("issue") or "")[:80]
+            for (flags,) in query.yield_per(1000)
+            for flag in (flags or [])
+        )
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return [issue for issue, _ in ranked[:limit]]
+
+    return [row.issue for row in db.execute(text(sql), params)]
+
+
+def _distribution(db: Session, column, base_filters, keys=()) -> dict:
+    dist = {key: 0 for key in keys}
+    rows = db.query(column, func.count()).filter(*base_filters).group_by(column)
+    for value, count in rows:
+        if keys and value not in dist:
+            continue
+        if value is not None:
+            dist[value] = count
+    return dist
+
 
 @router.get("/stats", response_model=schemas.DashboardStats)
-def get_stats(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def get_stats(
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(models.Review)
-    if not current_user.is_admin:
-        query = query.filter(models.Review.user_id == current_user.id)
+    scope = None if current_user.is_admin else current_user.id
+    aggregates = dashboard_cache_service.get(scope)
+    if aggregates is None:
+        async with dashboard_cache_service.lock(scope):
+            aggregates = dashboard_cache_service.get(scope)
+            if aggregates is None:
+                aggregates = await db.run_sync(_aggregates, scope)
+                dashboard_cache_service.put(scope, aggregates)
+    # Recent reviews come from an index, so they are always live
+    recent = await db.run_sync(
+        review_service.list_items, [] if scope is None else [Review.user_id == scope], 5
+    )
+    return {**aggregates, "recent_reviews": recent}
 
-    all_reviews = query.filter(models.Review.status == "completed").all()
-    total_reviews = query.count()
 
-    # Average brand score
-    avg_score = None
-    if all_reviews:
-        scores = [r.brand_score for r in all_reviews if r.brand_score is not None]
-        avg_score = round(sum(scores) / len(scores), 1) if scores else None
+def _aggregates(db: Session, user_id: Optional[int]) -> dict:
+    # Full scans of the scope's reviews; get_stats caches the result
+    scope = [] if user_id is None else [Review.user_id == user_id]
+    completed = scope + [Review.status == "completed"]
 
-    # Reviews this week
     week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    reviews_this_week = query.filter(models.Review.created_at >= week_ago).count()
+    total_reviews, reviews_this_week = db.query(
+        func.count(Review.id),
+        func.count(Review.id).filter(Review.created_at >= week_ago),
+    ).filter(*scope).one()
+
+    # Average brand score
+    avg_score = db.query(func.avg(Review.brand_score)).filter(*completed).scalar()
+    avg_score = round(float(avg_score), 1) if avg_score is not None else None
 
     # Top compliance issues
-    all_flags = []
-    for review in all_reviews:
-        if review.compliance_flags:
-            for flag in review.compliance_flags:
-                all_flags.append(flag.get("issue", "")[:80])
-    top_issues = [issue for issue, _ in Counter(all_flags).most_common(5)] if all_flags else []
-
-    # Rating distribution
-    rating_dist = {"A": 0, "B": 0, "C": 0, "D": 0, "F": 0}
-    for r in all_reviews:
-        if r.overall_rating in rating_dist:
-            rating_dist[r.overall_rating] += 1
-
-    # Sentiment distribution
-    sentiment_dist = {"positive": 0, "neutral": 0, "negative": 0}
-    for r in all_reviews:
-        if r.sentiment in sentiment_dist:
-            sentiment_dist[r.sentiment] += 1
-
-    # Content type distribution
-    content_type_dist: dict = {}
-    for r in all_reviews:
-        content_type_dist[r.content_type] = content_type_dist.get(r.content_type, 0) + 1
-
-    # Recent reviews (5 most recent, any status)
-    recent = (
-        query.order_by(models.Review.created_at.desc()).limit(5).all()
+    top_issues = _top_issues(db, user_id)
+
+    # Rating / sentiment / content type distributions
+    rating_dist = _distribution(db, Review.overall_rating, completed, ("A", "B", "C", "D", "F"))
+    sentiment_dist = _distribution(
+        db, Review.sentiment, completed, ("positive", "neutral", "negative")
     )
+    content_type_dist = _distribution(db, Review.content_type, completed)
 
     return {
         "total_reviews": total_reviews,
@@ -70,5 +120,4 @@ def get_stats(
         "rating_distribution": rating_dist,
         "sentiment_distribution": sentiment_dist,
         "content_type_distribution": content_type_dist,
-        "recent_reviews": recent,
     }
@@ -1,33 +1,46 @@
-import asyncio
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app import models, schemas
-from app.auth import get_current_user, require_admin
+from app.auth import get_current_user_async, require_admin_async
+from app.config import settings
 from app.services import slack_service, notion_service
-from app.services import claude_service
+from app.services import cache_service, guidelines_service, metrics_service, review_service
 
 router = APIRouter(prefix="/api/integrations", tags=["integrations"])
 
 
-def _get_brand_guidelines(db: Session) -> str:
-    guidelines = db.query(models.BrandGuidelines).first()
-    return guidelines.content if guidelines else ""
+def _check_mode(mode: str) -> None:
+    if mode not in review_service.ANALYSIS_MODES:
+        modes = ", ".join(review_service.ANALYSIS_MODES)
+        raise HTTPException(status_code=400, detail=f"mode must be one of {modes}")
+
+
+async def _get_config(db: AsyncSession, platform: str, active_only: bool = True):
+    query = select(models.IntegrationConfig).where(models.IntegrationConfig.platform == platform)
+    if active_only:
+        query = query.where(models.IntegrationConfig.is_active == True)
+    return (await db.scalars(query)).first()
 
 
 # ── Slack ─────────────────────────────────────────────────────────────────────
 
 @router.post("/slack/config")
-def save_slack_config(
+async def save_slack_config(
     payload: schemas.SlackConfig,
-    admin: models.User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    admin: models.User = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    config = db.query(models.IntegrationConfig).filter(
-        models.IntegrationConfig.platform == "slack"
-    ).first()
+    config = await _get_config(db, "slack", active_only=False)
     if config:
-        config.config = {"bot_token": payload.bot_token, "channel_ids": payload.channel_ids}
+        # Keep sync cursors and cached channel names
+        config.config = {
+            **(config.config or {}),
+            "bot_token": payload.bot_token,
+            "channel_ids": payload.channel_ids,
+        }
         config.is_active = True
     else:
         config = models.IntegrationConfig(
@@ -35,24 +48,21 @@ def save_slack_config(
             config={"bot_token": payload.bot_token, "channel_ids": payload.channel_ids},
         )
         db.add(config)
-    db.commit()
+    await db.commit()
     return {"status": "saved"}
 
 
 @router.get("/slack/channels")
-def list_slack_channels(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def list_slack_channels(
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    config = db.query(models.IntegrationConfig).filter(
-        models.IntegrationConfig.platform == "slack",
-        models.IntegrationConfig.is_active == True,
-    ).first()
+    config = await _get_config(db, "slack")
     if not config:
         raise HTTPException(status_code=404, detail="Slack not configured")
     bot_token = config.config.get("bot_token", "")
     try:
-        return slack_service.list_channels(bot_token)
+        return await run_in_threadpool(slack_service.list_channels, bot_token)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -61,63 +71,103 @@ def list_slack_channels(
 async def fetch_slack_messages(
     channel_id: str,
     limit: int = 20,
-    background_tasks: BackgroundTasks = None,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    full: bool = False,
+    bypass_cache: bool = False,
+    mode: str = "realtime",
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    config = db.query(models.IntegrationConfig).filter(
-        models.IntegrationConfig.platform == "slack",
-        models.IntegrationConfig.is_active == True,
-    ).first()
+    _check_mode(mode)
+    config = await _get_config(db, "slack")
     if not config:
         raise HTTPException(status_code=404, detail="Slack not configured")
 
-    bot_token = config.config.get("bot_token", "")
+    # Incremental sync: only messages newer than the channel's watermark,
+    # unless a full re-fetch is requested
+    state = dict(config.config or {})
+    cursors = dict(state.get("cursors", {}))
+    channel_names = dict(state.get("channel_names", {}))
+    bot_token = state.get("bot_token", "")
     try:
-        messages = slack_service.get_channel_messages(bot_token, channel_id, limit)
+        with metrics_service.timed(metrics_service.FETCH_TIME, source="slack"):
+            result = await run_in_threadpool(
+                slack_service.get_channel_messages,
+                bot_token,
+                channel_id,
+                limit,
+                oldest=None if full else cursors.get(channel_id),
+                channel_name=channel_names.get(channel_id),
+            )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Create pending reviews for each message and queue analysis
-    review_ids = []
-    for msg in messages:
-        review = models.Review(
-            user_id=current_user.id,
-            content_type="social_media",
-            original_content=msg["text"],
-            source="slack",
-            source_reference=f"{msg['channel_name']}/{msg['ts']}",
-            status="pending",
+    # Skip messages that were already imported
+    refs = {f"{msg['channel_name']}/{msg['ts']}": msg for msg in result["messages"]}
+    existing = set((await db.scalars(
+        select(models.Review.source_reference).where(
+            models.Review.source == "slack",
+            models.Review.source_reference.in_(list(refs)),
         )
-        db.add(review)
-        db.commit()
-        db.refresh(review)
-        review_ids.append(review.id)
+    )).all()) if refs else set()
+    messages = [msg for ref, msg in refs.items() if ref not in existing]
 
-    async def _analyze_all():
-        from app.routers.reviews import _run_analysis
-        for rid in review_ids:
-            await _run_analysis(rid)
+    # The watermark commits together with the new reviews. A truncated sync
+    # reports the newest message it kept, so the rest are picked up next time.
+    if result["latest_ts"] and (
+        channel_id not in cursors or float(result["latest_ts"]) > float(cursors[channel_id])
+    ):
+        cursors[channel_id] = result["latest_ts"]
+    channel_names[channel_id] = result["channel_name"]
+    config.config = {**state, "cursors": cursors, "channel_names": channel_names}
 
-    if background_tasks:
-        background_tasks.add_task(asyncio.run, _analyze_all())
+    # Create pending reviews for each message and queue analysis
+    guidelines = await db.run_sync(guidelines_service.current)
+    rows = await db.run_sync(
+        review_service.create_reviews,
+        current_user.id,
+        [
+            {
+                "content_type": "social_media",
+                "original_content": msg["text"],
+                "source": "slack",
+                "source_reference": f"{msg['channel_name']}/{msg['ts']}",
+            }
+            for msg in messages
+        ],
+        guidelines,
+        bypass_cache=bypass_cache,
+        priority=current_user.priority,
+    )
+    queued = await review_service.dispatch(
+        db, rows, guidelines, mode, bypass_cache, priority=current_user.priority
+    )
 
-    return {"queued": len(review_ids), "review_ids": review_ids}
+    return {
+        "queued": len(queued),
+        "cached": len(rows) - len(queued),
+        "skipped": len(refs) - len(messages),
+        "has_more": result["truncated"],
+        "import_id": rows[0]["import_id"] if rows else None,
+        "review_ids": [row["id"] for row in rows],
+    }
 
 
 # ── Notion ────────────────────────────────────────────────────────────────────
 
 @router.post("/notion/config")
-def save_notion_config(
+async def save_notion_config(
     payload: schemas.NotionConfig,
-    admin: models.User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    admin: models.User = Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    config = db.query(models.IntegrationConfig).filter(
-        models.IntegrationConfig.platform == "notion"
-    ).first()
+    config = await _get_config(db, "notion", active_only=False)
     if config:
-        config.config = {"api_key": payload.api_key, "database_ids": payload.database_ids}
+        # Keep sync watermarks
+        config.config = {
+            **(config.config or {}),
+            "api_key": payload.api_key,
+            "database_ids": payload.database_ids,
+        }
         config.is_active = True
     else:
         config = models.IntegrationConfig(
@@ -125,24 +175,21 @@ def save_notion_config(
             config={"api_key": payload.api_key, "database_ids": payload.database_ids},
         )
         db.add(config)
-    db.commit()
+    await db.commit()
     return {"status": "saved"}
 
 
 @router.get("/notion/databases")
-def list_notion_databases(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def list_notion_databases(
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    config = db.query(models.IntegrationConfig).filter(
-        models.IntegrationConfig.platform == "notion",
-        models.IntegrationConfig.is_active == True,
-    ).first()
+    config = await _get_config(db, "notion")
     if not config:
         raise HTTPException(status_code=404, detail="Notion not configured")
     api_key = config.config.get("api_key", "")
     try:
-        return notion_service.list_databases(api_key)
+        return await run_in_threadpool(notion_service.list_databases, api_key)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -152,59 +199,99 @@ async def fetch_notion_pages(
     database_id: str,
     content_type: str = "blog",
     limit: int = 20,
-    background_tasks: BackgroundTasks = None,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    full: bool = False,
+    bypass_cache: bool = False,
+    mode: str = "realtime",
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    config = db.query(models.IntegrationConfig).filter(
-        models.IntegrationConfig.platform == "notion",
-        models.IntegrationConfig.is_active == True,
-    ).first()
+    _check_mode(mode)
+    config = await _get_config(db, "notion")
     if not config:
         raise HTTPException(status_code=404, detail="Notion not configured")
 
-    api_key = config.config.get("api_key", "")
+    # Incremental sync: only pages edited since the database's watermark,
+    # unless a full re-fetch is requested
+    state = dict(config.config or {})
+    watermarks = dict(state.get("watermarks", {}))
+    edited_since = None if full else watermarks.get(database_id)
     try:
-        pages = notion_service.get_database_pages(api_key, database_id, limit)
+        with metrics_service.timed(metrics_service.FETCH_TIME, source="notion"):
+            pages = await notion_service.get_database_pages(
+                state.get("api_key", ""),
+                database_id,
+                settings.NOTION_SYNC_MAX_PAGES if edited_since else limit,
+                edited_since=edited_since,
+            )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    review_ids = []
-    for page in pages:
-        if not page["content"].strip():
-            continue
-        review = models.Review(
-            user_id=current_user.id,
-            content_type=content_type,
-            original_content=page["content"],
-            source="notion",
-            source_reference=page["id"],
-            status="pending",
-        )
-        db.add(review)
-        db.commit()
-        db.refresh(review)
-        review_ids.append(review.id)
+    # Re-review only pages whose content changed since their latest review
+    readable = [page for page in pages if not page["error"] and page["content"].strip()]
+    latest_hash = {}
+    if readable:
+        for ref, content_hash in await db.execute(
+            select(models.Review.source_reference, models.Review.content_hash).where(
+                models.Review.source == "notion",
+                models.Review.source_reference.in_([page["id"] for page in readable]),
+            ).order_by(models.Review.id)
+        ):
+            latest_hash[ref] = content_hash
+    changed = [
+        page for page in readable
+        if latest_hash.get(page["id"]) != cache_service.content_hash(page["content"])
+    ]
 
-    async def _analyze_all():
-        from app.routers.reviews import _run_analysis
-        for rid in review_ids:
-            await _run_analysis(rid)
+    # Notion timestamps are minute-granular and the query is on_or_after, so
+    # the watermark never skips a page; a failed page holds it back for a retry
+    failed = [page for page in pages if page["error"]]
+    edited = [p["last_edited_time"] for p in (failed or pages) if p["last_edited_time"]]
+    if edited:
+        watermarks[database_id] = min(edited) if failed else max(edited)
+        config.config = {**state, "watermarks": watermarks}
 
-    if background_tasks:
-        background_tasks.add_task(asyncio.run, _analyze_all())
+    guidelines = await db.run_sync(guidelines_service.current)
+    rows = await db.run_sync(
+        review_service.create_reviews,
+        current_user.id,
+        [
+            {
+                "content_type": content_type,
+                "original_content": page["content"],
+                "source": "notion",
+                "source_reference": page["id"],
+            }
+            for page in changed
+        ],
+        guidelines,
+        bypass_cache=bypass_cache,
+        priority=current_user.priority,
+    )
+    queued = await review_service.dispatch(
+        db, rows, guidelines, mode, bypass_cache, priority=current_user.priority
+    )
 
-    return {"queued": len(review_ids), "review_ids": review_ids}
+    return {
+        "queued": len(queued),
+        "cached": len(rows) - len(queued),
+        "unchanged": len(readable) - len(changed),
+        "import_id": rows[0]["import_id"] if rows else None,
+        "review_ids": [row["id"] for row in rows],
+        "failed": [
+            {"id": page["id"], "title": page["title"], "error": page["error"]}
+            for page in failed
+        ],
+    }
 
 
 @router.get("/status")
-def get_integration_status(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def get_integration_status(
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    configs = db.query(models.IntegrationConfig).filter(
-        models.IntegrationConfig.is_active == True
-    ).all()
+    configs = (await db.scalars(
+        select(models.IntegrationConfig).where(models.IntegrationConfig.is_active == True)
+    )).all()
     status = {"slack": False, "notion": False}
     for c in configs:
         if c.platform in status:
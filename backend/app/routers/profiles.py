@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from app import models
+from app.auth import require_admin
+from app.services import profiler_service
+
+# Only mounted when PROFILER_ENABLED is set
+router = APIRouter(prefix="/api/admin/profiles", tags=["profiles"])
+
+
+def _get(profile_id: int) -> profiler_service.Profile:
+    profile = profiler_service.get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found (it may have been evicted)")
+    return profile
+
+
+@router.get("/")
+def list_profiles(admin: models.User = Depends(require_admin)):
+    return profiler_service.list_profiles()
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: int, admin: models.User = Depends(require_admin)):
+    return _get(profile_id).detail()
+
+
+@router.get("/{profile_id}/speedscope")
+def download_speedscope(profile_id: int, admin: models.User = Depends(require_admin)):
+    profile = _get(profile_id)
+    return JSONResponse(
+        profile.speedscope(),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile.id}.speedscope.json"'
+        },
+    )
+
+
+@router.delete("/", status_code=204)
+def clear_profiles(admin: models.User = Depends(require_admin)):
+    profiler_service.clear()
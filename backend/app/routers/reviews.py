@@ -1,60 +1,46 @@
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from app.database import get_db
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.database import get_async_db, run_with_async_session
 from app import models, schemas
-from app.auth import get_current_user
-from app.services import claude_service
+from app.auth import get_current_user_async, get_stream_user_async
+from app.config import settings
+from app.services import (
+    analysis_service,
+    cache_service,
+    claude_service,
+    dashboard_cache_service,
+    events_service,
+    guidelines_service,
+    metrics_service,
+    queue_service,
+    review_service,
+    search_service,
+)
+from app.services.events_service import TERMINAL_STATUSES
 
 router = APIRouter(prefix="/api/reviews", tags=["reviews"])
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-def _get_brand_guidelines(db: Session) -> str:
-    guidelines = db.query(models.BrandGuidelines).first()
-    return guidelines.content if guidelines else ""
 
-
-async def _run_analysis(review_id: int):
-    from app.database import SessionLocal
-    db = SessionLocal()
-    try:
-        review = db.query(models.Review).filter(models.Review.id == review_id).first()
-        if not review:
-            return
-        brand_guidelines = _get_brand_guidelines(db)
-        result = await claude_service.analyze_content(
-            content=review.original_content,
-            content_type=review.content_type,
-            brand_guidelines=brand_guidelines,
-        )
-        review.brand_score = result["brand_score"]
-        review.brand_feedback = result["brand_feedback"]
-        review.compliance_flags = result["compliance_flags"]
-        review.sentiment = result["sentiment"]
-        review.sentiment_score = result["sentiment_score"]
-        review.sentiment_feedback = result["sentiment_feedback"]
-        review.suggested_rewrite = result["suggested_rewrite"]
-        review.overall_rating = result["overall_rating"]
-        review.summary = result["summary"]
-        review.status = "completed"
-        db.commit()
-    except Exception as e:
-        db = SessionLocal()
-        review = db.query(models.Review).filter(models.Review.id == review_id).first()
-        if review:
-            review.status = "error"
-            review.error_message = str(e)
-            db.commit()
-    finally:
-        db.close()
+async def _load_review(db: AsyncSession, review_id: int) -> Optional[models.Review]:
+    # ReviewOut includes the user, which can't lazy-load on an async session
+    return await db.get(
+        models.Review, review_id, options=[selectinload(models.Review.user)], populate_existing=True
+    )
 
 
 @router.post("/", response_model=schemas.ReviewOut, status_code=202)
 async def create_review(
     payload: schemas.ReviewCreate,
-    background_tasks: BackgroundTasks,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     review = models.Review(
         user_id=current_user.id,
@@ -62,41 +48,202 @@ async def create_review(
         original_content=payload.original_content,
         source=payload.source,
         source_reference=payload.source_reference,
+        content_hash=cache_service.content_hash(payload.original_content),
         status="pending",
     )
     db.add(review)
-    db.commit()
-    db.refresh(review)
+    guidelines = await db.run_sync(guidelines_service.current)
+    route = claude_service.select_route(
+        review.original_content, review.content_type, review.source, current_user.priority
+    )
+    # Cache hits complete synchronously; everything else goes to the queue
+    if payload.bypass_cache or not await db.run_sync(
+        analysis_service.complete_from_cache, review, guidelines, route.model
+    ):
+        await db.flush()
+        await db.run_sync(
+            queue_service.enqueue,
+            [review.id],
+            bypass_cache=payload.bypass_cache,
+            priority=current_user.priority,
+        )
+    await db.commit()
+    metrics_service.REVIEWS.labels("created").inc()
+    review = await _load_review(db, review.id)
 
-    background_tasks.add_task(asyncio.run, _run_analysis(review.id))
+    if review.status == "pending":
+        queue_service.notify()
+    else:
+        metrics_service.REVIEWS.labels("completed").inc()
     return review
 
 
+@router.post("/batch", response_model=schemas.ReviewBatchOut, status_code=202)
+async def create_reviews_batch(
+    payload: schemas.ReviewBatchCreate,
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="No items to review")
+    if len(payload.items) > settings.REVIEW_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.REVIEW_BATCH_MAX_ITEMS} items per batch",
+        )
+
+    guidelines = await db.run_sync(guidelines_service.current)
+    rows = await db.run_sync(
+        review_service.create_reviews,
+        current_user.id,
+        [item.model_dump() for item in payload.items],
+        guidelines,
+        bypass_cache=payload.bypass_cache,
+        priority=current_user.priority,
+    )
+    queued = await review_service.dispatch(
+        db, rows, guidelines, bypass_cache=payload.bypass_cache, priority=current_user.priority
+    )
+    return {
+        "queued": len(queued),
+        "cached": len(rows) - len(queued),
+        "import_id": rows[0]["import_id"],
+        "review_ids": [row["id"] for row in rows],
+    }
+
+
+def _review_states(db: Session, review_ids: List[int]) -> List[dict]:
+    reviews = db.query(models.Review).filter(models.Review.id.in_(review_ids)).all()
+    return [{"id": r.id, **analysis_service.result_event(r)} for r in reviews]
+
+
+async def _event_stream(request: Request, topic: str, review_ids: List[int]):
+    # Subscribed before the snapshot is read, so nothing published in between
+    # is missed. Reviews analysed in another process never reach this bus;
+    # the periodic DB check closes the stream for those.
+    queue = events_service.bus.subscribe(topic)
+    try:
+        remaining = set(review_ids)
+        states = await run_with_async_session(_review_states, review_ids)
+        for state in states:
+            yield events_service.format_sse("status", state)
+            if state["status"] in TERMINAL_STATUSES:
+                remaining.discard(state["id"])
+
+        while remaining:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(), timeout=settings.SSE_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                states = await run_with_async_session(_review_states, list(remaining))
+                for state in states:
+                    if state["status"] in TERMINAL_STATUSES:
+                        yield events_service.format_sse("status", state)
+                        remaining.discard(state["id"])
+                continue
+
+            yield events_service.format_sse(message["event"], message["data"])
+            if message["event"] == "status" and message["data"]["status"] in TERMINAL_STATUSES:
+                remaining.discard(message["data"]["id"])
+        yield events_service.format_sse("done", {"ids": review_ids})
+    finally:
+        events_service.bus.unsubscribe(topic, queue)
+
+
+@router.get("/imports/{import_id}/events")
+async def stream_import_events(
+    import_id: str,
+    request: Request,
+    current_user: models.User = Depends(get_stream_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = select(models.Review.id).where(models.Review.import_id == import_id)
+    if not current_user.is_admin:
+        query = query.where(models.Review.user_id == current_user.id)
+    review_ids = list((await db.scalars(query)).all())
+    if not review_ids:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return StreamingResponse(
+        _event_stream(request, f"import:{import_id}", review_ids),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @router.get("/", response_model=list[schemas.ReviewListItem])
-def list_reviews(
+async def list_reviews(
+    response: Response,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(models.Review)
-    if not current_user.is_admin:
-        query = query.filter(models.Review.user_id == current_user.id)
-    return (
-        query.order_by(models.Review.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    # Keyset pagination: pass back the X-Next-Cursor header as ?cursor=.
+    # skip is kept for older clients but gets slower on deep pages.
+    after = None
+    if cursor:
+        try:
+            after = review_service.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    filters = [] if current_user.is_admin else [models.Review.user_id == current_user.id]
+    items = await db.run_sync(
+        review_service.list_items, filters, limit, after=after, offset=0 if after else skip
     )
+    if len(items) == limit:
+        last = items[-1]
+        response.headers["X-Next-Cursor"] = review_service.encode_cursor(
+            last["created_at"], last["id"]
+        )
+    return items
+
+
+@router.get("/search", response_model=list[schemas.ReviewSearchHit])
+async def search_reviews(
+    q: str = Query(..., min_length=1, max_length=500),
+    rating: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    source: Optional[str] = None,
+    content_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Ranked full-text search over completed reviews: content, summary,
+    # brand feedback and compliance flags. Declared before /{review_id}.
+    try:
+        return await db.run_sync(
+            search_service.search,
+            q,
+            user_id=None if current_user.is_admin else current_user.id,
+            rating=rating,
+            sentiment=sentiment,
+            source=source,
+            content_type=content_type,
+            created_from=created_from,
+            created_to=created_to,
+            limit=limit,
+            offset=offset,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{review_id}", response_model=schemas.ReviewOut)
-def get_review(
+async def get_review(
     review_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    review = db.query(models.Review).filter(models.Review.id == review_id).first()
+    review = await _load_review(db, review_id)
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     if not current_user.is_admin and review.user_id != current_user.id:
@@ -104,16 +251,36 @@ def get_review(
     return review
 
 
+@router.get("/{review_id}/events")
+async def stream_review_events(
+    review_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_stream_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    review = await _load_review(db, review_id)
+    if not review:
+        raise HTTPException(status_code=404, detail="Review not found")
+    if not current_user.is_admin and review.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return StreamingResponse(
+        _event_stream(request, f"review:{review_id}", [review_id]),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
 @router.delete("/{review_id}", status_code=204)
-def delete_review(
+async def delete_review(
     review_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    review = db.query(models.Review).filter(models.Review.id == review_id).first()
+    review = await _load_review(db, review_id)
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     if not current_user.is_admin and review.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
-    db.delete(review)
-    db.commit()
+    await db.delete(review)
+    await db.commit()
+    dashboard_cache_service.invalidate(review.user_id)
@@ -4,6 +4,7 @@ from datetime import datetime, timezone
 from app.database import get_db
 from app import models, schemas
 from app.auth import get_current_user, require_admin
+from app.services import guidelines_service
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
@@ -15,7 +16,9 @@ def get_guidelines(
 ):
     guidelines = db.query(models.BrandGuidelines).first()
     if not guidelines:
-        guidelines = models.BrandGuidelines(content="", updated_at=datetime.now(timezone.utc))
+        guidelines = models.BrandGuidelines(
+            content="", version=1, updated_at=datetime.now(timezone.utc)
+        )
         db.add(guidelines)
         db.commit()
         db.refresh(guidelines)
@@ -32,13 +35,16 @@ def update_guidelines(
     if not guidelines:
         guidelines = models.BrandGuidelines(
             content=payload.content,
+            version=1,
             updated_by=admin.id,
         )
         db.add(guidelines)
     else:
         guidelines.content = payload.content
+        guidelines.version = models.BrandGuidelines.version + 1
         guidelines.updated_by = admin.id
         guidelines.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(guidelines)
+    guidelines_service.publish(guidelines)
     return guidelines
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Any
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Optional, List, Any, Literal
 from datetime import datetime
 
 
@@ -16,12 +16,17 @@ class UserUpdate(BaseModel):
     password: Optional[str] = None
 
 
+class AdminUserUpdate(UserUpdate):
+    priority: Optional[Literal["low", "normal", "high"]] = None
+
+
 class UserOut(BaseModel):
     id: int
     email: str
     full_name: str
     is_admin: bool
     is_active: bool
+    priority: Optional[str] = "normal"
     created_at: datetime
 
     class Config:
@@ -48,6 +53,7 @@ class BrandGuidelinesUpdate(BaseModel):
 class BrandGuidelinesOut(BaseModel):
     id: int
     content: str
+    version: int
     updated_at: datetime
 
     class Config:
@@ -59,17 +65,63 @@ class BrandGuidelinesOut(BaseModel):
 class ComplianceFlag(BaseModel):
     text: str
     issue: str
-    severity: str  # high, medium, low
+    severity: Literal["high", "medium", "low"]
     suggestion: str
 
-
-class ReviewCreate(BaseModel):
+    @field_validator("severity", mode="before")
+    @classmethod
+    def _lower(cls, v):
+        return v.strip().lower() if isinstance(v, str) else v
+
+
+class AnalysisResult(BaseModel):
+    # What the model must return; defaults match the prompt's "empty" values
+    brand_score: float = Field(50, ge=0, le=100)
+    brand_feedback: str = ""
+    compliance_flags: List[ComplianceFlag] = []
+    sentiment: Literal["positive", "neutral", "negative"] = "neutral"
+    sentiment_score: float = Field(0.5, ge=0.0, le=1.0)
+    sentiment_feedback: str = ""
+    suggested_rewrite: str = ""
+    overall_rating: Literal["A", "B", "C", "D", "F"] = "C"
+    summary: str = ""
+    confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+    @field_validator("sentiment", mode="before")
+    @classmethod
+    def _lower(cls, v):
+        return v.strip().lower() if isinstance(v, str) else v
+
+    @field_validator("overall_rating", mode="before")
+    @classmethod
+    def _letter(cls, v):
+        # "B+" and "b" are read as "B"
+        return v.strip()[:1].upper() if isinstance(v, str) else v
+
+
+class ReviewItem(BaseModel):
     content_type: str  # social_media, blog, email, ad_copy
     original_content: str
     source: str = "manual"
     source_reference: Optional[str] = None
 
 
+class ReviewCreate(ReviewItem):
+    bypass_cache: bool = False
+
+
+class ReviewBatchCreate(BaseModel):
+    items: List[ReviewItem]
+    bypass_cache: bool = False
+
+
+class ReviewBatchOut(BaseModel):
+    queued: int
+    cached: int
+    import_id: Optional[str] = None
+    review_ids: List[int]
+
+
 class ReviewOut(BaseModel):
     id: int
     user_id: int
@@ -88,6 +140,15 @@ class ReviewOut(BaseModel):
     summary: Optional[str]
     status: str
     error_message: Optional[str]
+    guidelines_version: Optional[int] = None
+    analysis_model: Optional[str] = None
+    analysis_route: Optional[str] = None
+    analysis_latency_ms: Optional[int] = None
+    analysis_escalated: Optional[bool] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cache_read_input_tokens: Optional[int] = None
+    cache_creation_input_tokens: Optional[int] = None
     created_at: datetime
     user: Optional[UserOut] = None
 
@@ -111,6 +172,11 @@ class ReviewListItem(BaseModel):
         from_attributes = True
 
 
+class ReviewSearchHit(ReviewListItem):
+    rank: float  # higher is more relevant; only comparable within one search
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+
+
 # ── Dashboard ─────────────────────────────────────────────────────────────────
 
 class DashboardStats(BaseModel):
@@ -0,0 +1,135 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.database import AsyncSessionLocal
+from app import models
+from app.services import (
+    claude_service, cache_service, events_service, guidelines_service, metrics_service
+)
+from app.services.guidelines_service import Guidelines
+
+
+def result_columns(result: dict) -> dict:
+    return {
+        "brand_score": result["brand_score"],
+        "brand_feedback": result["brand_feedback"],
+        "compliance_flags": result["compliance_flags"],
+        "sentiment": result["sentiment"],
+        "sentiment_score": result["sentiment_score"],
+        "sentiment_feedback": result["sentiment_feedback"],
+        "suggested_rewrite": result["suggested_rewrite"],
+        "overall_rating": result["overall_rating"],
+        "summary": result["summary"],
+        "status": "completed",
+    }
+
+
+def apply_result(review: models.Review, result: dict, guidelines: Guidelines) -> None:
+    for column, value in result_columns(result).items():
+        setattr(review, column, value)
+    review.guidelines_version = guidelines.version
+
+
+def result_event(review: models.Review) -> dict:
+    return {
+        "status": review.status,
+        "brand_score": review.brand_score,
+        "overall_rating": review.overall_rating,
+        "sentiment": review.sentiment,
+        "error_message": review.error_message,
+    }
+
+
+def complete_from_cache(
+    db: Session, review: models.Review, guidelines: Guidelines, model: str, count: bool = True
+) -> bool:
+    # model is the one the review would be routed to: a cheap-route result
+    # must not answer a request that would go to a stronger model
+    key = cache_service.make_key(review.original_content, review.content_type, guidelines.digest, model)
+    result = cache_service.get(db, key, count=count)
+    if result is None:
+        return False
+    apply_result(review, result, guidelines)
+    review.analysis_route = "cache"
+    return True
+
+
+async def run_analysis(review_id: int, bypass_cache: bool = False):
+    db = AsyncSessionLocal()
+    import_id = None
+    try:
+        review = await db.get(models.Review, review_id)
+        # A re-delivered job for a review that already finished is a no-op
+        if not review or review.status != "pending":
+            return
+        import_id = review.import_id
+        guidelines = await db.run_sync(guidelines_service.current)
+        priority = await db.scalar(
+            select(models.User.priority).where(models.User.id == review.user_id)
+        )
+        route = claude_service.select_route(
+            review.original_content, review.content_type, review.source, priority
+        )
+        # Duplicates within one import hit the entry written by the first
+        # analysis. The lookup was already counted when the review was created.
+        if not bypass_cache and await db.run_sync(
+            complete_from_cache, review, guidelines, route.model, False
+        ):
+            with metrics_service.timed(metrics_service.DB_COMMIT, operation="analysis_result"):
+                await db.commit()
+            metrics_service.REVIEWS.labels("completed").inc()
+            events_service.publish_review(review_id, import_id, "status", result_event(review))
+            return
+
+        # End the read transaction so no pooled connection is held for the
+        # length of the model call
+        await db.commit()
+
+        events_service.publish_review(review_id, import_id, "status", {"status": "running"})
+        outcome = await claude_service.analyze_content(
+            content=review.original_content,
+            content_type=review.content_type,
+            guidelines=guidelines,
+            route=route,
+            on_text=lambda text: events_service.publish_review(
+                review_id, import_id, "delta", {"text": text}
+            ),
+            on_field=lambda name, value: events_service.publish_review(
+                review_id, import_id, "field", {"field": name, "value": value}
+            ),
+        )
+        apply_result(review, outcome.result, guidelines)
+        review.analysis_model = outcome.model
+        review.analysis_route = outcome.route
+        review.analysis_latency_ms = outcome.latency_ms
+        review.analysis_escalated = outcome.escalated
+        for column, value in outcome.usage.columns().items():
+            setattr(review, column, value)
+        # Keyed and stored under the model that produced the result, which is
+        # the escalation model when the route escalated
+        await db.run_sync(
+            cache_service.put,
+            cache_service.make_key(
+                review.original_content, review.content_type, guidelines.digest, outcome.model
+            ),
+            outcome.result,
+            outcome.model,
+        )
+        with metrics_service.timed(metrics_service.DB_COMMIT, operation="analysis_result"):
+            await db.commit()
+        metrics_service.REVIEWS.labels("completed").inc()
+        events_service.publish_review(review_id, import_id, "status", result_event(review))
+    except Exception as e:
+        # Rate limits and outages go back to the queue via the worker
+        if claude_service.is_transient(e):
+            raise
+        await db.close()
+        db = AsyncSessionLocal()
+        review = await db.get(models.Review, review_id)
+        if review:
+            review.status = "error"
+            review.error_message = str(e)
+            await db.commit()
+            metrics_service.REVIEWS.labels("error").inc()
+            events_service.publish_review(review_id, import_id, "status", result_event(review))
+    finally:
+        await db.close()
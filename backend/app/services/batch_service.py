@@ -0,0 +1,370 @@
+import asyncio
+import json
+import logging
+from datetime import timedelta
+from typing import AsyncIterator, List, Optional, Protocol
+import httpx
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import run_with_async_session
+from app import models
+from app.models import utcnow
+from app.services import (
+    analysis_service,
+    cache_service,
+    claude_service,
+    events_service,
+    metrics_service,
+    queue_service,
+    result_service,
+)
+from app.services.guidelines_service import Guidelines
+
+logger = logging.getLogger(__name__)
+
+Batch = models.AnalysisBatch
+
+RESULT_CHUNK_SIZE = 500
+
+
+class SubmitFailed(Exception):
+    # The provider did not accept the batch, so nothing was recorded
+    pass
+
+
+# ── Batch clients ─────────────────────────────────────────────────────────────
+
+class BatchClient(Protocol):
+    async def create(self, requests: List[dict]) -> str: ...
+
+    async def retrieve(self, batch_id: str) -> dict: ...
+
+    def results(self, batch_id: str) -> AsyncIterator[dict]: ...
+
+
+class HttpBatchClient:
+    # Speaks the Message Batches REST API directly, so ANTHROPIC_BASE_URL can
+    # point it at a local fake batch server
+    def __init__(self, base_url: str, api_key: str):
+        self._http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={
+                "x-api-key": api_key,
+                "anthropic-version": "2023-06-01",
+            },
+            timeout=httpx.Timeout(
+                settings.ANTHROPIC_TIMEOUT,
+                connect=settings.ANTHROPIC_CONNECT_TIMEOUT,
+            ),
+        )
+
+    async def create(self, requests: List[dict]) -> str:
+        resp = await self._http.post("/v1/messages/batches", json={"requests": requests})
+        resp.raise_for_status()
+        return resp.json()["id"]
+
+    async def retrieve(self, batch_id: str) -> dict:
+        resp = await self._http.get(f"/v1/messages/batches/{batch_id}")
+        resp.raise_for_status()
+        return resp.json()
+
+    async def results(self, batch_id: str) -> AsyncIterator[dict]:
+        batch = await self.retrieve(batch_id)
+        url = batch.get("results_url") or f"/v1/messages/batches/{batch_id}/results"
+        async with self._http.stream("GET", url) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+
+_client: Optional[BatchClient] = None
+
+
+def set_client(client: Optional[BatchClient]) -> None:
+    global _client
+    _client = client
+
+
+def get_client() -> BatchClient:
+    global _client
+    if _client is None:
+        _client = HttpBatchClient(settings.ANTHROPIC_BASE_URL, settings.ANTHROPIC_API_KEY)
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if isinstance(_client, HttpBatchClient):
+        await _client.close()
+    _client = None
+
+
+# ── Submission ────────────────────────────────────────────────────────────────
+
+def _custom_id(review_id: int) -> str:
+    return f"review-{review_id}"
+
+
+def _review_id(custom_id: str) -> Optional[int]:
+    prefix, _, rid = custom_id.partition("-")
+    return int(rid) if prefix == "review" and rid.isdigit() else None
+
+
+def _record_batch(db: Session, provider_batch_id: str, guidelines: Guidelines, routes: dict) -> Batch:
+    batch = Batch(
+        provider_batch_id=provider_batch_id,
+        request_count=len(routes),
+        guidelines_version=guidelines.version,
+        guidelines_digest=guidelines.digest,
+    )
+    db.add(batch)
+    db.flush()
+    db.execute(
+        update(models.Review),
+        [
+            {"id": rid, "batch_id": batch.id, "analysis_route": route.name}
+            for rid, route in routes.items()
+        ],
+    )
+    return batch
+
+
+async def submit(
+    db: AsyncSession,
+    reviews: List[dict],
+    guidelines: Guidelines,
+    priority: Optional[str] = None,
+) -> Batch:
+    # Routed like realtime analyses, but without escalation: a batch result
+    # is final once collected
+    routes = {
+        review["id"]: claude_service.select_route(
+            review["original_content"], review["content_type"], review.get("source"), priority
+        )
+        for review in reviews
+    }
+    requests = [
+        {
+            "custom_id": _custom_id(review["id"]),
+            "params": claude_service.build_request_params(
+                review["original_content"], review["content_type"], guidelines, routes[review["id"]]
+            ),
+        }
+        for review in reviews
+    ]
+    try:
+        provider_batch_id = await get_client().create(requests)
+    except Exception as e:
+        raise SubmitFailed(str(e)) from e
+    # Past this point the provider will analyze these reviews; errors
+    # recording the batch propagate as themselves
+    return await db.run_sync(_record_batch, provider_batch_id, guidelines, routes)
+
+
+# ── Collection ────────────────────────────────────────────────────────────────
+
+def _open_batches(db: Session) -> list:
+    return db.query(Batch.id, Batch.provider_batch_id).filter(Batch.status == "submitted").all()
+
+
+def _lock_batch(db: Session, batch_id: int) -> bool:
+    now = utcnow()
+    locked = db.query(Batch).filter(
+        Batch.id == batch_id,
+        Batch.status == "submitted",
+        or_(Batch.locked_until.is_(None), Batch.locked_until < now),
+    ).update(
+        {Batch.locked_until: now + timedelta(seconds=settings.BATCH_LEASE_SECONDS)},
+        synchronize_session=False,
+    )
+    db.commit()
+    return locked == 1
+
+
+def _requeue(db: Session, review_ids: List[int]) -> None:
+    if not review_ids:
+        return
+    db.query(models.Review).filter(models.Review.id.in_(review_ids)).update(
+        {models.Review.batch_id: None}, synchronize_session=False
+    )
+    queue_service.enqueue(db, review_ids)
+
+
+def _usage_columns(message: dict) -> dict:
+    usage = claude_service.Usage()
+    usage.add(message.get("usage") or {}, message.get("model", "unknown"))
+    return usage.columns()
+
+
+def _write_results(db: Session, batch_id: int, items: List[dict]) -> None:
+    guidelines_version, guidelines_digest = db.query(
+        Batch.guidelines_version, Batch.guidelines_digest
+    ).filter(Batch.id == batch_id).one()
+    ids = [rid for rid in (_review_id(item.get("custom_id", "")) for item in items) if rid]
+    pending = {
+        row.id: row
+        for row in db.query(
+            models.Review.id,
+            models.Review.original_content,
+            models.Review.content_type,
+            models.Review.import_id,
+        ).filter(
+            models.Review.id.in_(ids),
+            models.Review.batch_id == batch_id,
+            models.Review.status == "pending",
+        )
+    }
+
+    mappings, retry = [], []
+    for item in items:
+        review = pending.get(_review_id(item.get("custom_id", "")))
+        if review is None:
+            continue
+        outcome = item.get("result", {})
+        if outcome.get("type") == "succeeded":
+            text = next(
+                (b.get("text", "") for b in outcome["message"]["content"] if b.get("type") == "text"),
+                "",
+            )
+            try:
+                result = result_service.parse(text)
+            except ValueError:
+                # Unrepairable output gets a fresh realtime analysis instead
+                retry.append(review.id)
+                continue
+            # The message echoes the routed model the request was sent with
+            model = outcome["message"].get("model")
+            mappings.append({
+                "id": review.id,
+                **analysis_service.result_columns(result),
+                "guidelines_version": guidelines_version,
+                "analysis_model": model,
+                **_usage_columns(outcome["message"]),
+            })
+            if model:
+                cache_service.put(
+                    db,
+                    cache_service.make_key(
+                        review.original_content, review.content_type, guidelines_digest, model
+                    ),
+                    result,
+                    model,
+                )
+        elif outcome.get("type") == "errored":
+            error = outcome.get("error", {})
+            message = error.get("error", {}).get("message") or error.get("message")
+            mappings.append({
+                "id": review.id,
+                "status": "error",
+                "error_message": message or "Batch request failed",
+            })
+        else:
+            # canceled / expired: fall back to the regular queue
+            retry.append(review.id)
+
+    if mappings:
+        db.execute(update(models.Review), mappings)
+    _requeue(db, retry)
+    with metrics_service.timed(metrics_service.DB_COMMIT, operation="batch_results"):
+        db.commit()
+    for mapping in mappings:
+        metrics_service.REVIEWS.labels(mapping["status"]).inc()
+
+    for mapping in mappings:
+        events_service.publish_review(
+            mapping["id"],
+            pending[mapping["id"]].import_id,
+            "status",
+            {
+                "status": mapping["status"],
+                "brand_score": mapping.get("brand_score"),
+                "overall_rating": mapping.get("overall_rating"),
+                "sentiment": mapping.get("sentiment"),
+                "error_message": mapping.get("error_message"),
+            },
+        )
+
+
+def _finish_batch(db: Session, batch_id: int, status: str, error: Optional[str] = None) -> None:
+    # Anything the results did not cover is analysed individually
+    leftover = [
+        rid for (rid,) in db.query(models.Review.id).filter(
+            models.Review.batch_id == batch_id,
+            models.Review.status == "pending",
+        )
+    ]
+    _requeue(db, leftover)
+    db.query(Batch).filter(Batch.id == batch_id).update(
+        {
+            Batch.status: status,
+            Batch.error_message: error,
+            Batch.ended_at: utcnow(),
+            Batch.locked_until: None,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    if leftover:
+        queue_service.notify()
+
+
+async def collect(batch_id: int, provider_batch_id: str) -> None:
+    chunk: List[dict] = []
+    try:
+        async for item in get_client().results(provider_batch_id):
+            chunk.append(item)
+            if len(chunk) >= RESULT_CHUNK_SIZE:
+                await run_with_async_session(_write_results, batch_id, chunk)
+                chunk = []
+        if chunk:
+            await run_with_async_session(_write_results, batch_id, chunk)
+    except Exception as e:
+        logger.exception("Failed to collect results for batch %s", provider_batch_id)
+        await run_with_async_session(_finish_batch, batch_id, "failed", str(e))
+        return
+    await run_with_async_session(_finish_batch, batch_id, "ended")
+
+
+async def poll_once() -> None:
+    for batch_id, provider_batch_id in await run_with_async_session(_open_batches):
+        try:
+            status = await get_client().retrieve(provider_batch_id)
+        except Exception:
+            logger.exception("Failed to poll batch %s", provider_batch_id)
+            continue
+        if status.get("processing_status") != "ended":
+            continue
+        if await run_with_async_session(_lock_batch, batch_id):
+            await collect(batch_id, provider_batch_id)
+
+
+class BatchPoller:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await poll_once()
+            except Exception:
+                logger.exception("Batch poll failed")
+            await asyncio.sleep(self.interval)
+
+
+poller = BatchPoller(interval=settings.BATCH_POLL_INTERVAL)
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import unicodedata
+from datetime import timedelta
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app import models
+from app.models import utcnow
+from app.services import metrics_service
+
+Entry = models.AnalysisCacheEntry
+
+
+def normalize_content(content: str) -> str:
+    # Whitespace-only differences (CRLF, trailing spaces) should not miss the cache
+    text = unicodedata.normalize("NFC", content).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+
+
+def make_key(
+    content: str,
+    content_type: str,
+    guidelines_digest: str,
+    model: Optional[str] = None,
+) -> str:
+    payload = json.dumps(
+        [
+            normalize_content(content),
+            content_type,
+            guidelines_digest,
+            model or settings.ANTHROPIC_MODEL,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cutoff():
+    return utcnow() - timedelta(seconds=settings.ANALYSIS_CACHE_TTL_SECONDS)
+
+
+def get(db: Session, key: str, count: bool = True) -> Optional[dict]:
+    # count=False for a repeat of a lookup that was already counted
+    if not settings.ANALYSIS_CACHE_ENABLED:
+        return None
+    entry = db.query(Entry).filter(Entry.key == key, Entry.created_at >= _cutoff()).first()
+    if count:
+        metrics_service.count_cache(hits=int(entry is not None), misses=int(entry is None))
+    if not entry:
+        return None
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_used_at = utcnow()
+    return dict(entry.result)
+
+
+def get_many(db: Session, keys: Iterable[str]) -> Dict[str, dict]:
+    keys = list(set(keys))
+    if not settings.ANALYSIS_CACHE_ENABLED or not keys:
+        return {}
+    hits = {
+        key: dict(result)
+        for key, result in db.query(Entry.key, Entry.result).filter(
+            Entry.key.in_(keys), Entry.created_at >= _cutoff()
+        )
+    }
+    metrics_service.count_cache(hits=len(hits), misses=len(keys) - len(hits))
+    if hits:
+        db.query(Entry).filter(Entry.key.in_(list(hits))).update(
+            {Entry.hit_count: Entry.hit_count + 1, Entry.last_used_at: utcnow()},
+            synchronize_session=False,
+        )
+    return hits
+
+
+def _upsert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(Entry)
+
+
+def put(db: Session, key: str, result: dict, model: Optional[str] = None) -> None:
+    if not settings.ANALYSIS_CACHE_ENABLED:
+        return
+    now = utcnow()
+    stmt = _upsert(db).values(
+        key=key,
+        model=model or settings.ANTHROPIC_MODEL,
+        result=result,
+        hit_count=0,
+        created_at=now,
+        last_used_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Entry.key],
+        set_={"result": stmt.excluded.result, "created_at": now, "last_used_at": now},
+    )
+    db.execute(stmt)
+
+
+def evict(db: Session) -> int:
+    removed = db.query(Entry).filter(Entry.created_at < _cutoff()).delete(synchronize_session=False)
+
+    # Size bound: drop least recently used entries beyond the limit
+    overflow = db.query(Entry).count() - settings.ANALYSIS_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        lru = db.query(Entry.key).order_by(Entry.last_used_at).limit(overflow).subquery()
+        removed += db.query(Entry).filter(Entry.key.in_(select(lru.c.key))).delete(
+            synchronize_session=False
+        )
+    db.commit()
+    return removed
@@ -0,0 +1,117 @@
+import re
+from typing import Dict, List
+
+_BLANK_LINES = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+SEVERITY_RANK = {"high": 2, "medium": 1, "low": 0}
+RATING_POINTS = {"A": 4, "B": 3, "C": 2, "D": 1, "F": 0}
+SENTIMENTS = ("positive", "neutral", "negative")
+
+
+# ── Splitting ─────────────────────────────────────────────────────────────────
+
+def _is_heading(paragraph: str) -> bool:
+    return paragraph.lstrip().startswith("#")
+
+
+def _split_long(paragraph: str, chunk_chars: int) -> List[str]:
+    # Sentence boundaries first; a single overlong sentence is cut hard
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > chunk_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:chunk_chars])
+            sentence = sentence[chunk_chars:]
+        if current and len(current) + 1 + len(sentence) > chunk_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_content(content: str, chunk_chars: int) -> List[str]:
+    # Packs paragraphs into chunks of at most chunk_chars, starting a new chunk
+    # at a heading once the current one is at least half full
+    paragraphs = []
+    for paragraph in _BLANK_LINES.split(content.strip()):
+        if paragraph.strip():
+            paragraphs.extend(
+                _split_long(paragraph, chunk_chars) if len(paragraph) > chunk_chars else [paragraph]
+            )
+
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        too_long = len(current) + 2 + len(paragraph) > chunk_chars
+        at_section = _is_heading(paragraph) and len(current) >= chunk_chars // 2
+        if current and (too_long or at_section):
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ── Merging ───────────────────────────────────────────────────────────────────
+
+def _weighted(values: List[float], weights: List[int]) -> float:
+    return sum(v * w for v, w in zip(values, weights)) / sum(weights)
+
+
+def _sections(texts: List[str]) -> str:
+    texts = [t.strip() for t in texts]
+    if len([t for t in texts if t]) <= 1:
+        return next((t for t in texts if t), "")
+    return "\n\n".join(f"Section {i}: {t}" for i, t in enumerate(texts, 1) if t)
+
+
+def _merge_flags(results: List[dict]) -> List[dict]:
+    # Same quoted text and issue from two chunks is one flag, at the higher severity
+    merged: Dict[tuple, dict] = {}
+    for result in results:
+        for flag in result["compliance_flags"]:
+            key = (" ".join(flag["text"].lower().split()), " ".join(flag["issue"].lower().split()))
+            kept = merged.get(key)
+            if kept is None:
+                merged[key] = dict(flag)
+            elif SEVERITY_RANK.get(flag["severity"], 0) > SEVERITY_RANK.get(kept["severity"], 0):
+                kept["severity"] = flag["severity"]
+    return list(merged.values())
+
+
+def merge_results(chunks: List[str], results: List[dict]) -> dict:
+    # Deterministic for a given set of chunk results: scores are weighted by
+    # chunk length, labels by weighted vote, text fields kept in chunk order
+    weights = [len(chunk) for chunk in chunks]
+
+    votes = {label: 0 for label in SENTIMENTS}
+    for result, weight in zip(results, weights):
+        votes[result["sentiment"]] += weight
+    sentiment = max(SENTIMENTS, key=lambda label: votes[label])  # ties keep SENTIMENTS order
+
+    points = _weighted([RATING_POINTS[r["overall_rating"]] for r in results], weights)
+    rating = min(RATING_POINTS, key=lambda letter: (abs(RATING_POINTS[letter] - points), letter))
+
+    confidences = [r["confidence"] for r in results if r.get("confidence") is not None]
+
+    return {
+        "brand_score": round(_weighted([r["brand_score"] for r in results], weights)),
+        "brand_feedback": _sections([r["brand_feedback"] for r in results]),
+        "compliance_flags": _merge_flags(results),
+        "sentiment": sentiment,
+        "sentiment_score": round(_weighted([r["sentiment_score"] for r in results], weights), 2),
+        "sentiment_feedback": _sections([r["sentiment_feedback"] for r in results]),
+        "suggested_rewrite": "\n\n".join(
+            (r["suggested_rewrite"] or chunk).strip() for r, chunk in zip(results, chunks)
+        ),
+        "overall_rating": rating,
+        "summary": _sections([r["summary"] for r in results]),
+        "confidence": min(confidences) if confidences else None,
+    }
@@ -1,6 +1,19 @@
-import json
+import asyncio
+import functools
+import logging
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, Union
 import anthropic
+import httpx
 from app.config import settings
+from app.services import chunk_service, metrics_service, result_service, throttle_service
+from app.services.guidelines_service import Guidelines
+
+logger = logging.getLogger(__name__)
+
+# Process-wide client, created in the app lifespan and reused by every analysis
+_client: Optional[anthropic.AsyncAnthropic] = None
 
 ANALYSIS_SYSTEM_PROMPT = """You are a senior marketing communications expert and brand compliance specialist.
 
@@ -30,7 +43,8 @@ Return ONLY valid JSON matching this exact schema (no markdown, no explanation):
   "sentiment_feedback": "<1-2 sentences on tone and emotional impact>",
   "suggested_rewrite": "<full improved version of the content>",
   "overall_rating": "A|B|C|D|F",
-  "summary": "<2-3 sentence overall assessment>"
+  "summary": "<2-3 sentence overall assessment>",
+  "confidence": <float 0.0-1.0, how certain you are of this assessment>
 }}
 
 If there are no compliance flags, return an empty array. Be specific and actionable."""
@@ -51,66 +65,411 @@ def build_system_prompt(brand_guidelines: str) -> str:
     return ANALYSIS_SYSTEM_PROMPT.format(guidelines_section=guidelines_section)
 
 
-async def analyze_content(
+def init_client() -> anthropic.AsyncAnthropic:
+    global _client
+    if _client is None:
+        _client = anthropic.AsyncAnthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            base_url=settings.ANTHROPIC_BASE_URL,
+            max_retries=0,  # retries go through _with_retries and the shared limiter
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.ANTHROPIC_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.ANTHROPIC_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    settings.ANTHROPIC_TIMEOUT,
+                    connect=settings.ANTHROPIC_CONNECT_TIMEOUT,
+                ),
+            ),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def get_client() -> anthropic.AsyncAnthropic:
+    return _client or init_client()
+
+
+def _error_type(e: anthropic.APIStatusError) -> Optional[str]:
+    body = e.body if isinstance(e.body, dict) else {}
+    return (body.get("error") or {}).get("type")
+
+
+def is_transient(e: Exception) -> bool:
+    # Rate limits, overload, 5xx and network failures; worth retrying later
+    if isinstance(e, (anthropic.APIConnectionError, throttle_service.CircuitOpen)):
+        return True
+    if isinstance(e, anthropic.APIStatusError):
+        return (
+            e.status_code == 429
+            or e.status_code >= 500
+            or _error_type(e) in ("overloaded_error", "rate_limit_error", "api_error")
+        )
+    return False
+
+
+def _retry_reason(e: Exception) -> str:
+    if isinstance(e, anthropic.APIStatusError):
+        return _error_type(e) or f"http_{e.status_code}"
+    return type(e).__name__
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def estimate_input_tokens(params: dict) -> int:
+    # ~4 characters per token; only used for rate limiting
+    chars = sum(len(block["text"]) for block in params["system"])
+    chars += sum(len(str(message["content"])) for message in params["messages"])
+    return chars // 4
+
+
+async def _with_retries(call: Callable[[], Awaitable[Any]], input_tokens: int) -> Any:
+    breaker = throttle_service.breaker
+    for attempt in range(settings.LLM_MAX_RETRIES + 1):
+        breaker.check()
+        await throttle_service.acquire(input_tokens)
+        try:
+            result = await call()
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()  # the API answered
+                raise
+            breaker.record_failure()
+            if attempt == settings.LLM_MAX_RETRIES:
+                raise
+            delay = throttle_service.backoff_delay(attempt, _retry_after(e))
+            metrics_service.LLM_RETRIES.labels(_retry_reason(e)).inc()
+            logger.warning("Anthropic API call failed (%s); retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+CONTENT_TYPE_LABELS = {
+    "social_media": "Social Media Post",
+    "blog": "Blog / Website Copy",
+    "email": "Email Campaign",
+    "ad_copy": "Ad Copy",
+}
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    model: str
+    thinking: Union[str, int]  # "adaptive", "off" or a budget in tokens
+    max_tokens: int
+    escalate: bool = False
+
+
+@dataclass
+class Usage:
+    # Summed over every call that went into one analysis
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+
+    def add(self, usage: Any, model: str) -> None:
+        # Takes the SDK's usage object or a usage dict from a batch result
+        for f in fields(self):
+            value = usage.get(f.name) if isinstance(usage, dict) else getattr(usage, f.name, None)
+            if value:
+                setattr(self, f.name, getattr(self, f.name) + value)
+                metrics_service.LLM_TOKENS.labels(model, f.name).inc(value)
+
+    def columns(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+@dataclass
+class AnalysisOutcome:
+    result: dict
+    model: str
+    route: str
+    latency_ms: int
+    escalated: bool = False
+    usage: Usage = field(default_factory=Usage)
+
+
+def default_route() -> Route:
+    return Route("default", settings.ANTHROPIC_MODEL, "adaptive", 4096)
+
+
+def _matches(rule: dict, content: str, content_type: str, source: str, priority: str) -> bool:
+    return (
+        ("content_types" not in rule or content_type in rule["content_types"])
+        and ("sources" not in rule or source in rule["sources"])
+        and ("priorities" not in rule or priority in rule["priorities"])
+        and len(content) >= rule.get("min_chars", 0)
+        and ("max_chars" not in rule or len(content) <= rule["max_chars"])
+    )
+
+
+def select_route(
     content: str,
     content_type: str,
-    brand_guidelines: str,
-) -> dict:
-    client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+    source: Optional[str] = None,
+    priority: Optional[str] = None,
+) -> Route:
+    default = default_route()
+    for i, rule in enumerate(settings.ANALYSIS_ROUTES):
+        if _matches(rule, content, content_type, source or "manual", priority or "normal"):
+            return Route(
+                name=rule.get("name", f"rule_{i}"),
+                model=rule.get("model", default.model),
+                thinking=rule.get("thinking", default.thinking),
+                max_tokens=rule.get("max_tokens", default.max_tokens),
+                escalate=rule.get("escalate", False),
+            )
+    return default
 
-    content_type_labels = {
-        "social_media": "Social Media Post",
-        "blog": "Blog / Website Copy",
-        "email": "Email Campaign",
-        "ad_copy": "Ad Copy",
-    }
-    label = content_type_labels.get(content_type, content_type.replace("_", " ").title())
 
-    system_prompt = build_system_prompt(brand_guidelines)
+def needs_escalation(result: dict) -> bool:
+    confidence = result.get("confidence")
+    if confidence is not None and confidence < settings.ESCALATION_MIN_CONFIDENCE:
+        return True
+    return any(flag.get("severity") == "high" for flag in result.get("compliance_flags", []))
+
 
+@functools.lru_cache(maxsize=8)
+def _system_prompt_for_version(version: int, brand_guidelines: str) -> str:
+    return build_system_prompt(brand_guidelines)
+
+
+def system_prompt(guidelines: Guidelines) -> str:
+    # Built once per guidelines version; byte-identical prompts keep prompt-cache hits
+    return _system_prompt_for_version(guidelines.version, guidelines.content)
+
+
+def build_request_params(
+    content: str,
+    content_type: str,
+    guidelines: Guidelines,
+    route: Optional[Route] = None,
+    section: Optional[Tuple[int, int]] = None,
+) -> dict:
+    route = route or default_route()
+    label = CONTENT_TYPE_LABELS.get(content_type, content_type.replace("_", " ").title())
+
+    if section:
+        # One part of chunked long-form content; the rewrite covers this part only
+        label += f" (section {section[0]} of {section[1]} of a longer piece)"
     user_message = f"Content Type: {label}\n\nContent to Review:\n\n{content}"
 
-    # Use streaming + get_final_message for large outputs with timeout protection
-    with client.messages.stream(
-        model="claude-opus-4-6",
-        max_tokens=4096,
-        thinking={"type": "adaptive"},
-        system=[
+    params = {
+        "model": route.model,
+        "max_tokens": route.max_tokens,
+        "system": [
             {
                 "type": "text",
-                "text": system_prompt,
+                "text": system_prompt(guidelines),
                 "cache_control": {"type": "ephemeral"},  # Cache guidelines across calls
             }
         ],
-        messages=[{"role": "user", "content": user_message}],
-    ) as stream:
-        final_message = stream.get_final_message()
-
-    # Extract text from response (skip thinking blocks)
-    response_text = ""
-    for block in final_message.content:
-        if block.type == "text":
-            response_text = block.text
-            break
-
-    # Parse JSON from response
-    # Strip markdown code fences if present
-    text = response_text.strip()
-    if text.startswith("```"):
-        lines = text.split("\n")
-        text = "\n".join(lines[1:-1]) if lines[-1].strip() == "```" else "\n".join(lines[1:])
-
-    result = json.loads(text)
-
-    # Ensure required fields with sensible defaults
-    result.setdefault("brand_score", 50)
-    result.setdefault("brand_feedback", "")
-    result.setdefault("compliance_flags", [])
-    result.setdefault("sentiment", "neutral")
-    result.setdefault("sentiment_score", 0.5)
-    result.setdefault("sentiment_feedback", "")
-    result.setdefault("suggested_rewrite", "")
-    result.setdefault("overall_rating", "C")
-    result.setdefault("summary", "")
-
-    return result
+        "messages": [{"role": "user", "content": user_message}],
+    }
+    if route.thinking == "adaptive":
+        params["thinking"] = {"type": "adaptive"}
+    elif isinstance(route.thinking, int):
+        params["thinking"] = {"type": "enabled", "budget_tokens": route.thinking}
+    return params
+
+
+async def repair_with_model(
+    content: str,
+    content_type: str,
+    guidelines: Guidelines,
+    broken: str,
+    error: str,
+    section: Optional[Tuple[int, int]] = None,
+    usage: Optional[Usage] = None,
+) -> dict:
+    # One cheap, non-thinking call on the small model: it gets the original
+    # request plus the broken output and returns the whole object again
+    params = build_request_params(content, content_type, guidelines, section=section)
+    params.pop("thinking", None)
+    params["model"] = settings.ANTHROPIC_REPAIR_MODEL
+    if broken.strip():
+        params["messages"].append({"role": "assistant", "content": broken.rstrip()})
+    params["messages"].append({
+        "role": "user",
+        "content": (
+            f"That response could not be used: {error}. "
+            "Reply with the complete analysis as a single valid JSON object matching "
+            "the schema, and nothing else."
+        ),
+    })
+
+    with metrics_service.timed(metrics_service.LLM_DURATION, model=params["model"]):
+        response = await _with_retries(
+            lambda: get_client().messages.create(**params), estimate_input_tokens(params)
+        )
+    if usage is not None:
+        usage.add(response.usage, params["model"])
+    text = next((block.text for block in response.content if block.type == "text"), "")
+    with metrics_service.timed(metrics_service.PARSE_TIME):
+        return result_service.parse(text)
+
+
+async def _generate(
+    content: str,
+    content_type: str,
+    guidelines: Guidelines,
+    route: Route,
+    on_text: Optional[Callable[[str], None]] = None,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+    section: Optional[Tuple[int, int]] = None,
+    usage: Optional[Usage] = None,
+) -> dict:
+    params = build_request_params(content, content_type, guidelines, route, section)
+    model = params["model"]
+    parser = result_service.StreamParser(on_field)
+
+    async def attempt() -> dict:
+        nonlocal parser
+        parser = result_service.StreamParser(on_field)
+        started = time.perf_counter()
+        first_token = None
+        parse_time = 0.0
+        try:
+            # Text is parsed as it streams; broken structure stops the generation early
+            async with get_client().messages.stream(**params) as stream:
+                async for event in stream:
+                    if event.type in ("text", "thinking") and first_token is None:
+                        first_token = time.perf_counter()
+                        metrics_service.LLM_TTFT.labels(model).observe(first_token - started)
+                    if event.type == "text":
+                        if on_text is not None:
+                            on_text(event.text)
+                        parse_started = time.perf_counter()
+                        parser.feed(event.text)
+                        parse_time += time.perf_counter() - parse_started
+                final_message = await stream.get_final_message()
+            if usage is not None:
+                usage.add(final_message.usage, model)
+            parse_started = time.perf_counter()
+            try:
+                return parser.result()
+            finally:
+                parse_time += time.perf_counter() - parse_started
+        finally:
+            if first_token is not None:
+                metrics_service.LLM_DURATION.labels(model).observe(time.perf_counter() - started)
+                metrics_service.PARSE_TIME.observe(parse_time)
+
+    try:
+        return await _with_retries(attempt, estimate_input_tokens(params))
+    except result_service.MalformedOutput as e:
+        error = str(e)
+
+    try:
+        return result_service.repair(parser.text)
+    except result_service.MalformedOutput:
+        pass
+    logger.warning("Unusable analysis output (%s); retrying with %s", error, settings.ANTHROPIC_REPAIR_MODEL)
+    return await repair_with_model(
+        content, content_type, guidelines, parser.text, error, section, usage
+    )
+
+
+async def _analyze_chunked(
+    content: str,
+    content_type: str,
+    guidelines: Guidelines,
+    route: Route,
+    usage: Usage,
+) -> Tuple[dict, str, bool]:
+    # Long-form content is analysed section by section, concurrently, and
+    # merged; a section that needs escalation is re-run on its own
+    chunks = chunk_service.split_content(content, settings.LONG_CONTENT_CHUNK_CHARS)
+    semaphore = asyncio.Semaphore(settings.LONG_CONTENT_MAX_PARALLEL)
+    escalated: List[bool] = [False] * len(chunks)
+
+    async def analyze_chunk(index: int) -> dict:
+        section = (index + 1, len(chunks))
+        async with semaphore:
+            result = await _generate(
+                chunks[index], content_type, guidelines, route, section=section, usage=usage
+            )
+            if route.escalate and route.model != settings.ANTHROPIC_MODEL and needs_escalation(result):
+                escalated[index] = True
+                result = await _generate(
+                    chunks[index], content_type, guidelines, default_route(),
+                    section=section, usage=usage,
+                )
+        return result
+
+    # The first failure cancels the other sections (and their model calls)
+    # and is re-raised as is, so is_transient still sees the original error
+    tasks = [asyncio.ensure_future(analyze_chunk(i)) for i in range(len(chunks))]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    results = [task.result() for task in tasks]
+    model = settings.ANTHROPIC_MODEL if any(escalated) else route.model
+    return result_service.validate(chunk_service.merge_results(chunks, results)), model, any(escalated)
+
+
+async def analyze_content(
+    content: str,
+    content_type: str,
+    guidelines: Guidelines,
+    route: Optional[Route] = None,
+    on_text: Optional[Callable[[str], None]] = None,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+) -> AnalysisOutcome:
+    route = route or default_route()
+    started = time.monotonic()
+    usage = Usage()
+
+    if len(content) > settings.LONG_CONTENT_THRESHOLD_CHARS:
+        result, model, escalated = await _analyze_chunked(
+            content, content_type, guidelines, route, usage
+        )
+        if on_field is not None:
+            for name, value in result.items():
+                on_field(name, value)
+    else:
+        result = await _generate(
+            content, content_type, guidelines, route, on_text, on_field, usage=usage
+        )
+        model, escalated = route.model, False
+        if route.escalate and route.model != settings.ANTHROPIC_MODEL and needs_escalation(result):
+            escalation = default_route()
+            result = await _generate(
+                content, content_type, guidelines, escalation, on_text, on_field, usage=usage
+            )
+            model, escalated = escalation.model, True
+
+    return AnalysisOutcome(
+        result=result,
+        model=model,
+        route=route.name,
+        latency_ms=int((time.monotonic() - started) * 1000),
+        escalated=escalated,
+        usage=usage,
+    )
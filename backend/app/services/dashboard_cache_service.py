@@ -0,0 +1,47 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional
+from app.config import settings
+from app.services.user_cache_service import MemoryBackend
+
+# Dashboard aggregates per scope (a user id, or None for the admin view).
+# Computing them scans every completed review in the scope, so the cost of
+# a miss grows with row count; the cache bounds that to one scan per scope
+# per DASHBOARD_CACHE_TTL_SECONDS and per process. New results show up
+# within the TTL; deleting a review drops the entries it appears in.
+
+_backend: Optional[MemoryBackend] = None
+_locks: Dict[Optional[int], asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+def get_backend() -> MemoryBackend:
+    global _backend
+    if _backend is None:
+        _backend = MemoryBackend(settings.DASHBOARD_CACHE_TTL_SECONDS, settings.DASHBOARD_CACHE_MAX_ENTRIES)
+    return _backend
+
+
+def lock(scope: Optional[int]) -> asyncio.Lock:
+    # Concurrent misses for one scope wait for a single scan
+    return _locks[scope]
+
+
+def get(scope: Optional[int]) -> Optional[dict]:
+    if settings.DASHBOARD_CACHE_TTL_SECONDS <= 0:
+        return None
+    return get_backend().get(scope)
+
+
+def put(scope: Optional[int], aggregates: dict) -> None:
+    if settings.DASHBOARD_CACHE_TTL_SECONDS > 0:
+        get_backend().set(scope, aggregates)
+
+
+def invalidate(user_id: int) -> None:
+    get_backend().delete(user_id)
+    get_backend().delete(None)
+
+
+def clear() -> None:
+    global _backend
+    _backend = None
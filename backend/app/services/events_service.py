@@ -0,0 +1,62 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+TERMINAL_STATUSES = ("completed", "error")
+
+SUBSCRIBER_QUEUE_SIZE = 512
+
+
+class EventBus:
+    # In-process fan-out of review progress. Nothing is persisted: a slow
+    # subscriber loses its oldest events rather than blocking the analysis.
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, topic: str) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers[topic].add(queue)
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def publish(self, topic: str, event: str, data: dict) -> None:
+        if topic not in self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        # Worker code that writes results from a thread hands off to the loop
+        if self._loop is not None and running is not self._loop:
+            self._loop.call_soon_threadsafe(self._deliver, topic, event, data)
+        else:
+            self._deliver(topic, event, data)
+
+    def _deliver(self, topic: str, event: str, data: dict) -> None:
+        for queue in list(self._subscribers.get(topic, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait({"event": event, "data": data})
+
+
+bus = EventBus()
+
+
+def publish_review(review_id: int, import_id: Optional[str], event: str, data: dict) -> None:
+    payload = {"id": review_id, **data}
+    bus.publish(f"review:{review_id}", event, payload)
+    if import_id:
+        bus.publish(f"import:{import_id}", event, payload)
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,37 @@
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.config import settings
+from app import models
+
+
+@dataclass(frozen=True)
+class Guidelines:
+    version: int
+    content: str
+    digest: str = field(init=False)
+
+    def __post_init__(self):
+        digest = hashlib.sha256(self.content.strip().encode("utf-8")).hexdigest()
+        object.__setattr__(self, "digest", digest)
+
+
+_current: Optional[Guidelines] = None
+_loaded_at = 0.0
+
+
+def publish(row: Optional[models.BrandGuidelines]) -> Guidelines:
+    global _current, _loaded_at
+    _current = Guidelines(row.version or 1, row.content or "") if row else Guidelines(0, "")
+    _loaded_at = time.monotonic()
+    return _current
+
+
+def current(db: Session) -> Guidelines:
+    # Other processes pick up a new version within GUIDELINES_REFRESH_SECONDS;
+    # the process that saved it publishes immediately
+    if _current is not None and time.monotonic() - _loaded_at < settings.GUIDELINES_REFRESH_SECONDS:
+        return _current
+    return publish(db.query(models.BrandGuidelines).first())
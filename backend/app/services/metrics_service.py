@@ -0,0 +1,67 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+)
+
+# Upstream calls and queue waits run from milliseconds to minutes
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+QUEUE_WAIT = Histogram(
+    "analysis_queue_wait_seconds", "Time from enqueue (or retry) to claim", buckets=SLOW_BUCKETS
+)
+LLM_TTFT = Histogram(
+    "llm_time_to_first_token_seconds", "Anthropic time to first streamed token", ["model"],
+    buckets=SLOW_BUCKETS,
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds", "Anthropic call duration", ["model"], buckets=SLOW_BUCKETS
+)
+PARSE_TIME = Histogram(
+    "analysis_parse_seconds", "CPU time spent parsing and validating model output", buckets=FAST_BUCKETS
+)
+DB_COMMIT = Histogram(
+    "db_commit_seconds", "Database commit time", ["operation"], buckets=FAST_BUCKETS
+)
+FETCH_TIME = Histogram(
+    "integration_fetch_seconds", "Slack/Notion fetch time", ["source"], buckets=SLOW_BUCKETS
+)
+
+REVIEWS = Counter("reviews_total", "Reviews created and finished, by status", ["status"])
+CACHE_REQUESTS = Counter("analysis_cache_requests_total", "Analysis cache lookups", ["result"])
+LLM_RETRIES = Counter("llm_retries_total", "Retried Anthropic calls", ["reason"])
+LLM_TOKENS = Counter("llm_tokens_total", "Anthropic tokens by model and kind", ["model", "kind"])
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+def count_cache(hits: int, misses: int) -> None:
+    if hits:
+        CACHE_REQUESTS.labels("hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels("miss").inc(misses)
+
+
+def render() -> Tuple[bytes, str]:
+    # With several server processes, set PROMETHEUS_MULTIPROC_DIR so every
+    # process writes its samples there and any of them can serve the total
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,55 +1,148 @@
-from typing import List
-from notion_client import Client
+import asyncio
+import hashlib
+from typing import List, Optional
+from notion_client import AsyncClient, Client
+from notion_client.errors import APIResponseError
+from app.config import settings
+from app.services import throttle_service
+
+# Blocks whose children are separate pages/databases, not part of this page
+SKIP_CHILDREN = {"child_page", "child_database"}
+
+RATE_LIMIT_RETRIES = 3
 
 
 def _extract_rich_text(rich_text_array: list) -> str:
     return "".join(item.get("plain_text", "") for item in rich_text_array)
 
 
-def _extract_page_content(client: Client, page_id: str) -> str:
-    try:
-        blocks = client.blocks.children.list(block_id=page_id)
+def _page_title(page: dict) -> str:
+    for prop_value in page.get("properties", {}).values():
+        if prop_value["type"] == "title":
+            rich_text = prop_value.get("title", [])
+            if rich_text:
+                return _extract_rich_text(rich_text)
+    return "Untitled"
+
+
+def _rate_bucket(api_key: str) -> str:
+    # Notion limits per integration token: every extraction with the same
+    # token shares one bucket (across processes with LLM_LIMITER_URL)
+    return "notion:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class PageExtractor:
+    def __init__(self, client: AsyncClient, concurrency: int, per_second: float, bucket: str):
+        self.client = client
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._per_second = per_second
+        self._bucket = bucket
+
+    async def _call(self, endpoint, **kwargs) -> dict:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            async with self._semaphore:
+                await throttle_service.acquire_rate(self._bucket, self._per_second)
+                try:
+                    return await endpoint(**kwargs)
+                except APIResponseError as e:
+                    if e.code != "rate_limited" or attempt == RATE_LIMIT_RETRIES:
+                        raise
+                    retry_after = float((getattr(e, "headers", None) or {}).get("retry-after", 1))
+            await asyncio.sleep(retry_after)
+
+    async def _paginate(self, endpoint, limit: Optional[int] = None, **kwargs) -> List[dict]:
+        results: List[dict] = []
+        cursor = None
+        while limit is None or len(results) < limit:
+            page_size = 100 if limit is None else min(100, limit - len(results))
+            params = {**kwargs, "page_size": page_size}
+            if cursor:
+                params["start_cursor"] = cursor
+            response = await self._call(endpoint, **params)
+            results.extend(response["results"])
+            cursor = response.get("next_cursor")
+            if not response.get("has_more") or not cursor:
+                break
+        return results
+
+    async def query_database(self, database_id: str, limit: int, **query) -> List[dict]:
+        return await self._paginate(
+            self.client.databases.query, limit=limit, database_id=database_id, **query
+        )
+
+    async def _block_lines(self, block_id: str, depth: int = 0) -> List[str]:
+        blocks = await self._paginate(self.client.blocks.children.list, block_id=block_id)
+
+        async def _children(block: dict) -> List[str]:
+            if (
+                block.get("has_children")
+                and block["type"] not in SKIP_CHILDREN
+                and depth < settings.NOTION_MAX_BLOCK_DEPTH
+            ):
+                return await self._block_lines(block["id"], depth + 1)
+            return []
+
+        # Toggles, columns and nested list items are walked concurrently
+        nested = await asyncio.gather(*(_children(block) for block in blocks))
         lines = []
-        for block in blocks["results"]:
-            block_type = block["type"]
-            block_data = block.get(block_type, {})
-            rich_text = block_data.get("rich_text", [])
+        for block, children in zip(blocks, nested):
+            rich_text = block.get(block["type"], {}).get("rich_text", [])
             if rich_text:
                 lines.append(_extract_rich_text(rich_text))
-        return "\n".join(lines)
-    except Exception:
-        return ""
+            lines.extend(children)
+        return lines
+
+    async def extract_page(self, page: dict) -> dict:
+        extracted = {
+            "id": page["id"],
+            "title": _page_title(page),
+            "url": page.get("url", ""),
+            "last_edited_time": page.get("last_edited_time"),
+            "content": "",
+            "error": None,
+        }
+        try:
+            extracted["content"] = "\n".join(await self._block_lines(page["id"]))
+        except Exception as e:
+            extracted["error"] = str(e)
+        return extracted
 
 
-def get_database_pages(api_key: str, database_id: str, limit: int = 20) -> List[dict]:
-    client = Client(auth=api_key)
+async def get_database_pages(
+    api_key: str,
+    database_id: str,
+    limit: int = 20,
+    edited_since: Optional[str] = None,
+) -> List[dict]:
+    # Without edited_since: the `limit` most recently edited pages. With it:
+    # pages edited on or after that time, oldest edit first, so a capped sync
+    # resumes where it stopped. Unreadable pages come back with "error" set.
+    if edited_since:
+        query = {
+            "filter": {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": edited_since},
+            },
+            "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}],
+        }
+    else:
+        query = {"sorts": [{"timestamp": "last_edited_time", "direction": "descending"}]}
+    client = AsyncClient(auth=api_key, base_url=settings.NOTION_BASE_URL)
+    extractor = PageExtractor(
+        client, settings.NOTION_MAX_CONCURRENCY, settings.NOTION_REQUESTS_PER_SECOND, _rate_bucket(api_key)
+    )
     try:
-        result = client.databases.query(database_id=database_id, page_size=limit)
-        pages = []
-        for page in result["results"]:
-            # Extract title from properties
-            title = "Untitled"
-            for prop_name, prop_value in page.get("properties", {}).items():
-                if prop_value["type"] == "title":
-                    rich_text = prop_value.get("title", [])
-                    if rich_text:
-                        title = _extract_rich_text(rich_text)
-                        break
-
-            content = _extract_page_content(client, page["id"])
-            pages.append({
-                "id": page["id"],
-                "title": title,
-                "url": page.get("url", ""),
-                "content": content,
-            })
-        return pages
-    except Exception as e:
-        raise ValueError(f"Notion API error: {str(e)}")
+        try:
+            pages = await extractor.query_database(database_id, limit, **query)
+        except Exception as e:
+            raise ValueError(f"Notion API error: {str(e)}")
+        return await asyncio.gather(*(extractor.extract_page(page) for page in pages))
+    finally:
+        await client.aclose()
 
 
 def list_databases(api_key: str) -> List[dict]:
-    client = Client(auth=api_key)
+    client = Client(auth=api_key, base_url=settings.NOTION_BASE_URL)
     try:
         result = client.search(filter={"value": "database", "property": "object"}, page_size=50)
         databases = []
@@ -0,0 +1,287 @@
+import asyncio
+import itertools
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from app.config import settings
+
+PROFILE_HEADER = "x-profile"
+
+# Threads parked in one of these are idle (event loop in select, threadpool
+# workers waiting for a job) and would only bury the interesting stacks
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "concurrent/futures/thread.py")
+
+# Frames are (name, file, line); a stack is a root-first tuple of frame indexes
+Frame = Tuple[str, str, int]
+
+
+@dataclass
+class Profile:
+    id: int
+    method: str
+    path: str
+    trigger: str  # "header" or "sampled"
+    started_at: datetime
+    status: Optional[int] = None
+    duration_ms: Optional[float] = None
+    interval: float = 0.005
+    frames: List[Frame] = field(default_factory=list)
+    # thread name -> list of (stack, weight in seconds)
+    samples: Dict[str, List[Tuple[tuple, float]]] = field(default_factory=dict)
+    # (offset from start in seconds, duration in seconds, statement)
+    queries: List[Tuple[float, float, str]] = field(default_factory=list)
+    dropped_queries: int = 0
+    _frame_index: Dict[Frame, int] = field(default_factory=dict, repr=False)
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def frame(self, key: Frame) -> int:
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append(key)
+        return index
+
+    def add_query(self, started: float, duration: float, statement: str) -> None:
+        if len(self.queries) >= settings.PROFILER_MAX_QUERIES:
+            self.dropped_queries += 1
+            return
+        self.queries.append((started - self._started, duration, " ".join(statement.split())))
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "samples": sum(len(s) for s in self.samples.values()),
+            "query_count": len(self.queries) + self.dropped_queries,
+            "query_ms": round(sum(q[1] for q in self.queries) * 1000, 2),
+        }
+
+    def detail(self) -> dict:
+        return {
+            **self.summary(),
+            "queries": [
+                {"offset_ms": round(at * 1000, 2), "duration_ms": round(d * 1000, 3), "statement": sql}
+                for at, d, sql in self.queries
+            ],
+            "dropped_queries": self.dropped_queries,
+        }
+
+    def speedscope(self) -> dict:
+        # https://www.speedscope.app/file-format-schema.json: one sampled
+        # profile per thread plus an evented "SQL" timeline
+        frames = [{"name": name, "file": file, "line": line} for name, file, line in self.frames]
+        end = (self.duration_ms or 0) / 1000
+        profiles = [
+            {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(w for _, w in samples),
+                "samples": [list(stack) for stack, _ in samples],
+                "weights": [w for _, w in samples],
+            }
+            for thread, samples in self.samples.items()
+        ]
+        if self.queries:
+            events = []
+            for at, duration, statement in self.queries:
+                index = len(frames)
+                frames.append({"name": statement[:200]})
+                events.append({"type": "O", "frame": index, "at": at})
+                events.append({"type": "C", "frame": index, "at": at + duration})
+            profiles.append({
+                "type": "evented",
+                "name": "SQL",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": max(end, events[-1]["at"]),
+                "events": events,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.method} {self.path} #{self.id}",
+            "exporter": "marketing-reviewer",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class Sampler:
+    # Samples every thread's stack from a background thread. It sees the whole
+    # process, so requests running alongside the profiled one show up too.
+    def __init__(self, profile: Profile, max_seconds: float):
+        self.profile = profile
+        self.max_seconds = max_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        deadline = time.perf_counter() + self.max_seconds
+        last = time.perf_counter()
+        while not self._stop.wait(self.profile.interval) and time.perf_counter() < deadline:
+            now = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, top in sys._current_frames().items():
+                if ident == own or top.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                stack = []
+                frame = top
+                while frame is not None:
+                    code = frame.f_code
+                    name = getattr(code, "co_qualname", code.co_name)
+                    stack.append(self.profile.frame((name, code.co_filename, code.co_firstlineno)))
+                    frame = frame.f_back
+                stack.reverse()
+                thread = names.get(ident, str(ident))
+                self.profile.samples.setdefault(thread, []).append((tuple(stack), now - last))
+            last = now
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+
+_profiles: Deque[Profile] = deque(maxlen=max(1, settings.PROFILER_MAX_PROFILES))
+_ids = itertools.count(1)
+# One capture at a time: the sampler already covers every thread
+_capturing = threading.Lock()
+_current: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+
+
+def list_profiles() -> List[dict]:
+    return [p.summary() for p in reversed(_profiles)]
+
+
+def get_profile(profile_id: int) -> Optional[Profile]:
+    return next((p for p in _profiles if p.id == profile_id), None)
+
+
+def clear() -> None:
+    _profiles.clear()
+
+
+# ── SQL timing ────────────────────────────────────────────────────────────────
+
+def instrument(engine) -> None:
+    # Statements are recorded only while a profiled request is in context
+    # (FastAPI copies the context into the threadpool for sync handlers)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        started = conn.info.get("profiler_started")
+        if profile is not None and started:
+            begun = started.pop()
+            # A capture that hit its deadline is already stored; leave it as is
+            if profile.duration_ms is None:
+                profile.add_query(begun, time.perf_counter() - begun, statement)
+
+
+# ── Middleware ────────────────────────────────────────────────────────────────
+
+class ProfilerMiddleware:
+    # Profiles a request when an admin sends "X-Profile: 1", or at random
+    # with PROFILER_SAMPLE_RATE. The capture runs until the last body chunk
+    # is sent, so streamed responses are covered up to PROFILER_MAX_SECONDS,
+    # when it is stored and the next request can be captured. Sampled event
+    # streams stop at the response headers: they can stay open far longer
+    # than any handler runs.
+    def __init__(self, app, authorize):
+        self.app = app
+        # async (token) -> bool: whether the bearer token belongs to an admin
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trigger = await self._trigger(scope)
+        if trigger is None or not _capturing.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        profile = Profile(
+            id=next(_ids),
+            method=scope["method"],
+            path=scope["path"],
+            trigger=trigger,
+            started_at=datetime.now(timezone.utc),
+            interval=settings.PROFILER_INTERVAL_MS / 1000,
+        )
+        sampler = Sampler(profile, settings.PROFILER_MAX_SECONDS)
+        reset = _current.set(profile)
+        sampler.start()
+        # finish() can race between the response, the deadline and cleanup
+        finished = threading.Lock()
+
+        def finish():
+            if not finished.acquire(blocking=False):
+                return
+            sampler.stop()
+            profile.duration_ms = round((time.perf_counter() - profile._started) * 1000, 2)
+            _profiles.append(profile)
+            _capturing.release()
+
+        async def expire():
+            await asyncio.sleep(settings.PROFILER_MAX_SECONDS)
+            await asyncio.to_thread(finish)
+
+        async def send_wrapper(message):
+            done = message["type"] == "http.response.body" and not message.get("more_body")
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", []))
+                message["headers"] = headers + [(b"x-profile-id", str(profile.id).encode())]
+                content_type = dict(headers).get(b"content-type", b"")
+                done = trigger == "sampled" and content_type.startswith(b"text/event-stream")
+            await send(message)
+            if done:
+                await asyncio.to_thread(finish)
+
+        deadline = asyncio.create_task(expire())
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            profile.status = profile.status or 500
+            raise
+        finally:
+            deadline.cancel()
+            _current.reset(reset)
+            # Joining the sampler waits up to one interval; keep it off the loop
+            if not finished.locked():
+                await asyncio.to_thread(finish)
+
+    async def _trigger(self, scope) -> Optional[str]:
+        if not scope["path"].startswith("/api/"):
+            return None
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER.encode()) in (b"1", b"true"):
+            auth = headers.get(b"authorization", b"").decode()
+            token = auth[7:] if auth.lower().startswith("bearer ") else ""
+            if token and await self.authorize(token):
+                return "header"
+        if settings.PROFILER_SAMPLE_RATE and random.random() < settings.PROFILER_SAMPLE_RATE:
+            return "sampled"
+        return None
@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import run_with_async_session
+from app import models
+from app.models import utcnow
+from app.services import cache_service, metrics_service, throttle_service
+
+logger = logging.getLogger(__name__)
+
+Job = models.AnalysisJob
+
+# User priority -> job priority; higher is claimed first
+JOB_PRIORITIES = {"low": -1, "normal": 0, "high": 1}
+
+
+# ── Job table operations ──────────────────────────────────────────────────────
+
+def enqueue(
+    db: Session,
+    review_ids: List[int],
+    bypass_cache: bool = False,
+    priority: Optional[str] = None,
+) -> None:
+    # Part of the caller's transaction so reviews and their jobs commit together.
+    # A review that already has a live job is skipped (unique partial index).
+    if review_ids:
+        level = JOB_PRIORITIES.get(priority or "normal", 0)
+        db.execute(
+            _insert_job(db).on_conflict_do_nothing(),
+            [
+                {"review_id": rid, "status": "queued", "bypass_cache": bypass_cache, "priority": level}
+                for rid in review_ids
+            ],
+        )
+
+
+def _insert_job(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(Job)
+
+
+def requeue_pending_reviews(db: Session) -> int:
+    # Several workers starting at once may all pick the same reviews; the
+    # live-job index lets only one job per review through
+    live_jobs = select(Job.review_id).where(Job.status.in_(("queued", "running")))
+    stuck = [
+        rid for (rid,) in db.query(models.Review.id).filter(
+            models.Review.status == "pending",
+            models.Review.batch_id.is_(None),  # collected by the batch poller
+            models.Review.id.not_in(live_jobs),
+        )
+    ]
+    if stuck:
+        enqueue(db, stuck)
+        db.commit()
+    return len(stuck)
+
+
+def _fail_exhausted(db: Session, now) -> None:
+    # Jobs whose lease expired once too often (e.g. they keep crashing the worker)
+    exhausted = [
+        (job_id, review_id) for job_id, review_id in db.query(Job.id, Job.review_id).filter(
+            Job.status == "running",
+            Job.lease_expires_at < now,
+            Job.attempts >= settings.JOB_MAX_ATTEMPTS,
+        )
+    ]
+    if not exhausted:
+        return
+    db.query(Job).filter(Job.id.in_([j for j, _ in exhausted])).update(
+        {Job.status: "failed", Job.lease_token: None, Job.last_error: "Lease expired too many times"},
+        synchronize_session=False,
+    )
+    db.query(models.Review).filter(
+        models.Review.id.in_([r for _, r in exhausted]),
+        models.Review.status == "pending",
+    ).update(
+        {models.Review.status: "error", models.Review.error_message: "Analysis did not complete"},
+        synchronize_session=False,
+    )
+    metrics_service.REVIEWS.labels("error").inc(len(exhausted))
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int) -> list:
+    now = utcnow()
+    _fail_exhausted(db, now)
+
+    claimable = and_(
+        or_(
+            Job.status == "queued",
+            and_(Job.status == "running", Job.lease_expires_at < now),
+        ),
+        Job.attempts < settings.JOB_MAX_ATTEMPTS,
+        or_(Job.available_at.is_(None), Job.available_at <= now),
+    )
+    candidates = (
+        select(Job.id).where(claimable).order_by(Job.priority.desc(), Job.id).limit(limit)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        # Lock the candidate rows, skipping ones another worker is claiming
+        ids = [row.id for row in db.execute(candidates.with_for_update(skip_locked=True))]
+        if not ids:
+            db.commit()
+            return []
+        target = Job.id.in_(ids)
+    else:
+        # SQLite has no row locks, but a single UPDATE ... WHERE id IN (SELECT ...)
+        # runs under the database write lock, so two workers cannot claim the same row
+        target = and_(Job.id.in_(candidates), claimable)
+
+    token = uuid.uuid4().hex
+    db.query(Job).filter(target).update(
+        {
+            Job.status: "running",
+            Job.worker_id: worker_id,
+            Job.lease_token: token,
+            Job.lease_expires_at: now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            Job.attempts: Job.attempts + 1,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    jobs = (
+        db.query(
+            Job.id, Job.review_id, Job.lease_token, Job.bypass_cache,
+            func.coalesce(Job.available_at, Job.created_at).label("queued_at"),
+        )
+        .filter(Job.lease_token == token)
+        .all()
+    )
+    for job in jobs:
+        if job.queued_at is not None:
+            metrics_service.QUEUE_WAIT.observe(max(0.0, (now - job.queued_at).total_seconds()))
+    return jobs
+
+
+def renew_leases(db: Session, leases: Dict[int, str]) -> None:
+    expires = utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    for job_id, token in leases.items():
+        db.query(Job).filter(Job.id == job_id, Job.lease_token == token).update(
+            {Job.lease_expires_at: expires}, synchronize_session=False
+        )
+    db.commit()
+
+
+def complete_job(db: Session, job_id: int, token: str) -> None:
+    db.query(Job).filter(Job.id == job_id, Job.lease_token == token).update(
+        {Job.status: "done", Job.lease_token: None, Job.lease_expires_at: None},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def fail_job(
+    db: Session,
+    job_id: int,
+    token: str,
+    error: str,
+    retry_delay: Optional[float] = None,
+    refund_attempt: bool = False,
+) -> None:
+    # Requeues with exponential backoff (or retry_delay) until attempts run
+    # out, then fails the job and its review
+    job = db.query(Job).filter(Job.id == job_id, Job.lease_token == token).first()
+    if not job:
+        return
+    if refund_attempt:
+        job.attempts -= 1
+    job.lease_token = None
+    job.lease_expires_at = None
+    job.last_error = error
+    if job.attempts < settings.JOB_MAX_ATTEMPTS:
+        if retry_delay is None:
+            retry_delay = settings.JOB_RETRY_DELAY_SECONDS * 2 ** max(job.attempts - 1, 0)
+        job.status = "queued"
+        job.available_at = utcnow() + timedelta(seconds=retry_delay)
+    else:
+        job.status = "failed"
+        failed = db.query(models.Review).filter(
+            models.Review.id == job.review_id, models.Review.status == "pending"
+        ).update(
+            {models.Review.status: "error", models.Review.error_message: error},
+            synchronize_session=False,
+        )
+        if failed:
+            metrics_service.REVIEWS.labels("error").inc(failed)
+    db.commit()
+
+
+def release_jobs(db: Session, leases: Dict[int, str]) -> None:
+    # Hand unfinished jobs straight back to the queue on graceful shutdown
+    for job_id, token in leases.items():
+        db.query(Job).filter(Job.id == job_id, Job.lease_token == token).update(
+            {
+                Job.status: "queued",
+                Job.lease_token: None,
+                Job.lease_expires_at: None,
+                Job.attempts: Job.attempts - 1,
+            },
+            synchronize_session=False,
+        )
+    db.commit()
+
+
+# ── Worker ────────────────────────────────────────────────────────────────────
+
+class AnalysisWorker:
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leases: Dict[int, str] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runners: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._runners = [
+            asyncio.create_task(self._poll_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+        ]
+
+    async def stop(self) -> None:
+        tasks = self._runners + list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._leases:
+            await run_with_async_session(release_jobs, dict(self._leases))
+        self._runners = []
+        self._loop = None
+
+    def notify(self) -> None:
+        # Safe to call from sync handlers running in the threadpool
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            # An open circuit pauses claiming; half-open lets one trial through
+            free = throttle_service.breaker.claim_limit(self.concurrency - len(self._tasks))
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await run_with_async_session(claim_jobs, self.worker_id, free)
+                except Exception:
+                    logger.exception("Failed to claim analysis jobs")
+                for job in claimed:
+                    self._leases[job.id] = job.lease_token
+                    self._tasks[job.id] = asyncio.create_task(
+                        self._execute(job.id, job.review_id, job.lease_token, job.bypass_cache)
+                    )
+            if claimed and len(claimed) == free:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            if self._leases:
+                try:
+                    await run_with_async_session(renew_leases, dict(self._leases))
+                except Exception:
+                    logger.exception("Failed to renew analysis job leases")
+            try:
+                await run_with_async_session(cache_service.evict)
+            except Exception:
+                logger.exception("Failed to evict analysis cache entries")
+
+    async def _execute(self, job_id: int, review_id: int, token: str, bypass_cache: bool) -> None:
+        from app.services.analysis_service import run_analysis
+        try:
+            try:
+                await run_analysis(review_id, bypass_cache=bool(bypass_cache))
+            except throttle_service.CircuitOpen as e:
+                # Not the job's fault: back in the queue without using an attempt
+                await run_with_async_session(
+                    fail_job, job_id, token, str(e), settings.CIRCUIT_OPEN_SECONDS, True
+                )
+            except Exception as e:
+                logger.exception("Analysis job %s failed", job_id)
+                await run_with_async_session(fail_job, job_id, token, str(e))
+            else:
+                await run_with_async_session(complete_job, job_id, token)
+        except Exception:
+            # The lease lapses and the job is re-claimed by a later poll
+            logger.exception("Failed to record result of analysis job %s", job_id)
+        finally:
+            self._tasks.pop(job_id, None)
+            self._wakeup.set()
+        # Not reached on cancellation: stop() hands the still-leased job back
+        self._leases.pop(job_id, None)
+
+
+worker = AnalysisWorker(
+    concurrency=settings.WORKER_CONCURRENCY,
+    poll_interval=settings.WORKER_POLL_INTERVAL,
+)
+
+
+def notify() -> None:
+    worker.notify()
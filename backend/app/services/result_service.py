@@ -0,0 +1,216 @@
+import json
+import re
+from typing import Any, Callable, Optional
+from pydantic import ValidationError
+from app.schemas import AnalysisResult
+
+# Prose the model may write before the opening brace ("Here is the analysis:")
+MAX_PREAMBLE_CHARS = 200
+
+WHITESPACE = " \t\r\n"
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class MalformedOutput(ValueError):
+    pass
+
+
+def validate(data: Any) -> dict:
+    try:
+        return AnalysisResult.model_validate(data).model_dump()
+    except ValidationError as e:
+        raise MalformedOutput(f"Response does not match the analysis schema: {e}")
+
+
+class StreamParser:
+    # Tracks the structure of the top-level JSON object as text arrives. Each
+    # top-level value is decoded once its closing character is seen, checked
+    # against AnalysisResult and handed to on_field, so brand_score is known
+    # long before suggested_rewrite finishes. Broken structure raises
+    # MalformedOutput straight away so the caller can stop the generation.
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None):
+        self.text = ""
+        self.fields: dict = {}
+        self.invalid: dict = {}
+        self._on_field = on_field
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self._start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def done(self) -> bool:
+        return self._state == "end"
+
+    def feed(self, chunk: str) -> None:
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            if self._step(text[self._pos]):
+                self._pos += 1
+
+    def _fail(self, reason: str):
+        raise MalformedOutput(f"{reason} at offset {self._pos}")
+
+    def _step(self, ch: str) -> bool:
+        # Returns False when the character must be looked at again in the new state
+        state = self._state
+        if state == "start":
+            if ch == "{":
+                self._state = "key"
+            elif ch == "`":
+                self._state = "fence"
+            elif self._pos >= MAX_PREAMBLE_CHARS:
+                self._fail("No JSON object in response")
+        elif state == "fence":
+            if ch == "\n":
+                self._state = "start"
+        elif state == "key":
+            if ch == '"':
+                self._start = self._pos
+                self._state = "key_string"
+            elif ch == "}":
+                self._state = "end"
+            elif ch not in WHITESPACE:
+                self._fail("Expected a field name")
+        elif state == "key_string":
+            if self._string_closed(ch):
+                self._key = json.loads(self.text[self._start:self._pos + 1])
+                self._state = "colon"
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value"
+            elif ch not in WHITESPACE:
+                self._fail("Expected ':'")
+        elif state == "value":
+            if ch in WHITESPACE:
+                return True
+            self._start = self._pos
+            if ch in "{[":
+                self._depth = 1
+                self._state = "nested"
+            elif ch == '"':
+                self._state = "string"
+            elif ch in ",}]":
+                self._fail("Missing value")
+            else:
+                self._state = "scalar"
+        elif state == "string":
+            if self._string_closed(ch):
+                self._finish(self._pos + 1)
+        elif state == "nested":
+            if self._in_string:
+                self._string_closed(ch)
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish(self._pos + 1)
+        elif state == "scalar":
+            if ch in ",}" or ch in WHITESPACE:
+                self._finish(self._pos)
+                return False
+        elif state == "after_value":
+            if ch == ",":
+                self._state = "key"
+            elif ch == "}":
+                self._state = "end"
+            elif ch not in WHITESPACE:
+                self._fail("Expected ',' or '}'")
+        return True
+
+    def _string_closed(self, ch: str) -> bool:
+        if self._escape:
+            self._escape = False
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            return True
+        return False
+
+    def _finish(self, end: int) -> None:
+        raw = self.text[self._start:end]
+        try:
+            value = json.loads(raw, strict=False)
+        except json.JSONDecodeError:
+            self._fail(f"Invalid value for {self._key!r}")
+        self._state = "after_value"
+        self.fields[self._key] = value
+        if self._key not in AnalysisResult.model_fields:
+            return
+        # A bad value is kept for repair rather than aborting: the rest of
+        # the response is usually fine
+        try:
+            checked = AnalysisResult.model_validate({self._key: value})
+        except ValidationError as e:
+            self.invalid[self._key] = str(e)
+            return
+        if self._on_field is not None:
+            self._on_field(self._key, checked.model_dump(include={self._key})[self._key])
+
+    def result(self) -> dict:
+        if not self.done:
+            raise MalformedOutput("Response ended before the JSON object was closed")
+        return validate(self.fields)
+
+
+def repair(text: str) -> dict:
+    # Local fixes for common slips: code fences or prose around the object,
+    # trailing commas, raw newlines in strings and missing closing brackets.
+    # A response cut off inside a string is not repaired; the value is lost.
+    start = text.find("{")
+    if start < 0:
+        raise MalformedOutput("No JSON object in response")
+    end = text.rfind("}")
+    candidate = text[start:end + 1] if end > start else text[start:]
+    candidate = _TRAILING_COMMA.sub(r"\1", candidate)
+    try:
+        return validate(json.loads(candidate, strict=False))
+    except json.JSONDecodeError:
+        pass
+
+    candidate = _close_brackets(text[start:])
+    try:
+        data = json.loads(_TRAILING_COMMA.sub(r"\1", candidate), strict=False)
+    except json.JSONDecodeError as e:
+        raise MalformedOutput(f"Response is not valid JSON: {e}")
+    return validate(data)
+
+
+def _close_brackets(text: str) -> str:
+    stack, in_string, escape = [], False, False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        raise MalformedOutput("Response was cut off inside a string")
+    return text.rstrip().rstrip(",") + "".join(reversed(stack))
+
+
+def parse(text: str) -> dict:
+    # Whole-response parse, used for batch results and repair output
+    parser = StreamParser()
+    try:
+        parser.feed(text)
+        return parser.result()
+    except MalformedOutput:
+        return repair(text)
@@ -0,0 +1,194 @@
+import base64
+import binascii
+import logging
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app import models
+from app.services import (
+    analysis_service, batch_service, cache_service, claude_service, metrics_service, queue_service
+)
+from app.services.guidelines_service import Guidelines
+
+logger = logging.getLogger(__name__)
+
+Review = models.Review
+
+ANALYSIS_MODES = ("realtime", "batch")
+
+# Every row in a bulk insert carries the same keys
+PENDING_COLUMNS = {
+    "brand_score": None,
+    "brand_feedback": None,
+    "compliance_flags": [],
+    "sentiment": None,
+    "sentiment_score": None,
+    "sentiment_feedback": None,
+    "suggested_rewrite": None,
+    "overall_rating": None,
+    "summary": None,
+    "status": "pending",
+    "guidelines_version": None,
+    "analysis_model": None,
+    "analysis_route": None,
+    "analysis_latency_ms": None,
+    "analysis_escalated": False,
+}
+
+PREVIEW_CHARS = 300
+
+# Only what the list view renders; original_content is a truncated preview
+LIST_COLUMNS = (
+    Review.id,
+    Review.user_id,
+    Review.content_type,
+    func.substr(Review.original_content, 1, PREVIEW_CHARS).label("original_content"),
+    Review.source,
+    Review.brand_score,
+    Review.overall_rating,
+    Review.sentiment,
+    Review.status,
+    Review.created_at,
+)
+
+
+def encode_cursor(created_at: datetime, review_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{review_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, review_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def list_items(
+    db: Session,
+    filters: list,
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    offset: int = 0,
+) -> List[dict]:
+    query = db.query(*LIST_COLUMNS).filter(*filters)
+    if after is not None:
+        query = query.filter(tuple_(Review.created_at, Review.id) < tuple_(*after))
+    rows = (
+        query.order_by(Review.created_at.desc(), Review.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+    # One query for all authors instead of a lazy load per row
+    user_ids = {row.user_id for row in rows}
+    users = (
+        {u.id: u for u in db.query(models.User).filter(models.User.id.in_(user_ids))}
+        if user_ids else {}
+    )
+    return [{**row._asdict(), "user": users.get(row.user_id)} for row in rows]
+
+
+def create_reviews(
+    db: Session,
+    user_id: int,
+    items: List[dict],
+    guidelines: Guidelines,
+    bypass_cache: bool = False,
+    priority: Optional[str] = None,
+) -> List[dict]:
+    # One multi-row INSERT ... RETURNING for the whole set; cache hits are
+    # inserted already completed. The rows share an import_id for progress
+    # streaming. Nothing is committed here.
+    import_id = uuid.uuid4().hex
+    # Looked up under the model each item would be routed to
+    keys = [
+        cache_service.make_key(
+            item["original_content"],
+            item["content_type"],
+            guidelines.digest,
+            claude_service.select_route(
+                item["original_content"], item["content_type"], item.get("source"), priority
+            ).model,
+        )
+        for item in items
+    ]
+    cached = {} if bypass_cache else cache_service.get_many(db, keys)
+
+    rows = []
+    for item, key in zip(items, keys):
+        row = {
+            "user_id": user_id,
+            "content_type": item["content_type"],
+            "original_content": item["original_content"],
+            "source": item.get("source") or "manual",
+            "source_reference": item.get("source_reference"),
+            "content_hash": cache_service.content_hash(item["original_content"]),
+            "import_id": import_id,
+            **PENDING_COLUMNS,
+        }
+        if key in cached:
+            row.update(analysis_service.result_columns(cached[key]))
+            row["guidelines_version"] = guidelines.version
+            row["analysis_route"] = "cache"
+        rows.append(row)
+    if not rows:
+        return []
+
+    ids = db.execute(
+        insert(Review).returning(Review.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    for row, review_id in zip(rows, ids):
+        row["id"] = review_id
+    metrics_service.REVIEWS.labels("created").inc(len(rows))
+    if cached:
+        metrics_service.REVIEWS.labels("completed").inc(
+            sum(1 for row in rows if row["status"] == "completed")
+        )
+    return rows
+
+
+async def dispatch(
+    db: AsyncSession,
+    rows: List[dict],
+    guidelines: Guidelines,
+    mode: str = "realtime",
+    bypass_cache: bool = False,
+    priority: Optional[str] = None,
+) -> List[int]:
+    # Queues the pending rows and commits. Batch mode submits them as one
+    # Message Batch; if the provider rejects it they go through the regular
+    # queue instead.
+    pending = [row for row in rows if row["status"] == "pending"]
+    if mode == "batch" and pending:
+        try:
+            await batch_service.submit(db, pending, guidelines, priority)
+        except batch_service.SubmitFailed:
+            # Raised before submit writes anything, so the session still holds
+            # just the new reviews
+            logger.exception("Message Batch submission failed; falling back to queue")
+        except Exception:
+            # The provider accepted the batch but recording it failed: queueing
+            # the reviews as well would analyze them twice, so drop it all
+            await db.rollback()
+            raise
+        else:
+            await db.commit()
+            return [row["id"] for row in pending]
+    await db.run_sync(
+        queue_service.enqueue,
+        [row["id"] for row in pending],
+        bypass_cache=bypass_cache,
+        priority=priority,
+    )
+    with metrics_service.timed(metrics_service.DB_COMMIT, operation="create_reviews"):
+        await db.commit()
+    if pending:
+        queue_service.notify()
+    return [row["id"] for row in pending]
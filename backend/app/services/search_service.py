@@ -0,0 +1,158 @@
+import html
+import re
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import column, desc, func, literal_column, select, table, text
+from sqlalchemy.orm import Session
+from app import models
+from app.services import review_service
+
+Review = models.Review
+
+# Must match the text search configuration in migration 0004
+PG_CONFIG = "english"
+# Highlight markers: control characters can't come from the stored text, so
+# the snippet is HTML-escaped first and the markers swapped for <mark> after
+MARK_START, MARK_END = "\x02", "\x03"
+PG_HEADLINE_OPTIONS = (
+    f"StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2, MaxWords=24, MinWords=8, "
+    "FragmentDelimiter= … "
+)
+# bm25 column weights, in reviews_fts column order:
+# original_content, summary, brand_feedback, flags
+SQLITE_WEIGHTS = "1.0, 2.0, 0.5, 1.0"
+
+_fts = table("reviews_fts", column("rowid"))
+
+
+def _fts5_query(query: str) -> str:
+    # Every word must match; the last one as a prefix for search-as-you-type.
+    # Quoting each term keeps FTS5 operators in user input from being parsed.
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        raise ValueError("Search query has no searchable words")
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # created_at is stored as naive UTC (models.utcnow)
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _filters(
+    user_id: Optional[int],
+    rating: Optional[str],
+    sentiment: Optional[str],
+    source: Optional[str],
+    content_type: Optional[str],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+) -> list:
+    filters = []
+    if user_id is not None:
+        filters.append(Review.user_id == user_id)
+    if rating:
+        filters.append(Review.overall_rating == rating)
+    if sentiment:
+        filters.append(Review.sentiment == sentiment)
+    if source:
+        filters.append(Review.source == source)
+    if content_type:
+        filters.append(Review.content_type == content_type)
+    if created_from:
+        filters.append(Review.created_at >= _naive_utc(created_from))
+    if created_to:
+        filters.append(Review.created_at < _naive_utc(created_to))
+    return filters
+
+
+def _ranked_sqlite(db: Session, query: str, filters: list, limit: int, offset: int) -> list:
+    stmt = (
+        select(
+            Review.id,
+            # bm25 is lower-is-better; negate so every dialect ranks high first
+            literal_column(f"-bm25(reviews_fts, {SQLITE_WEIGHTS})").label("score"),
+            literal_column("snippet(reviews_fts, -1, char(2), char(3), '…', 24)").label("snippet"),
+        )
+        .select_from(Review.__table__.join(_fts, _fts.c.rowid == Review.id))
+        .where(text("reviews_fts MATCH :match"), *filters)
+        .order_by(desc("score"), Review.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return db.execute(stmt, {"match": _fts5_query(query)}).all()
+
+
+def _ranked_postgres(db: Session, query: str, filters: list, limit: int, offset: int) -> list:
+    if not re.search(r"\w", query):
+        raise ValueError("Search query has no searchable words")
+    tsquery = func.websearch_to_tsquery(PG_CONFIG, query)
+    vector = literal_column("reviews.search_vector")
+    # Rank and page on the GIN index first; ts_headline re-parses the text,
+    # so it only runs for the rows on this page
+    ranked = (
+        select(Review.id, func.ts_rank_cd(vector, tsquery).label("score"))
+        .where(vector.op("@@")(tsquery), *filters)
+        .order_by(desc("score"), Review.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .subquery()
+    )
+    document = func.concat_ws(" … ", Review.summary, Review.brand_feedback, Review.original_content)
+    stmt = (
+        select(
+            ranked.c.id,
+            ranked.c.score,
+            func.ts_headline(PG_CONFIG, document, tsquery, PG_HEADLINE_OPTIONS).label("snippet"),
+        )
+        .select_from(ranked)
+        .join(Review, Review.id == ranked.c.id)
+        .order_by(ranked.c.score.desc(), ranked.c.id.desc())
+    )
+    return db.execute(stmt).all()
+
+
+def search(
+    db: Session,
+    query: str,
+    user_id: Optional[int] = None,
+    rating: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    source: Optional[str] = None,
+    content_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[dict]:
+    # Completed reviews only: the index is maintained by triggers (migration
+    # 0004) as reviews complete, change or are deleted
+    filters = _filters(user_id, rating, sentiment, source, content_type, created_from, created_to)
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        ranked = _ranked_sqlite(db, query, filters, limit, offset)
+    elif dialect == "postgresql":
+        ranked = _ranked_postgres(db, query, filters, limit, offset)
+    else:
+        raise ValueError(f"Search is not supported on {dialect}")
+    if not ranked:
+        return []
+
+    items = {
+        item["id"]: item
+        for item in review_service.list_items(db, [Review.id.in_([r.id for r in ranked])], len(ranked))
+    }
+    return [
+        {**items[r.id], "rank": float(r.score), "snippet": _highlight(r.snippet)}
+        for r in ranked
+        if r.id in items
+    ]
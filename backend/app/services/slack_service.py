@@ -1,19 +1,69 @@
-from typing import List
+import logging
+from collections import deque
+from typing import List, Optional
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from app.config import settings
 
+logger = logging.getLogger(__name__)
 
-def get_channel_messages(bot_token: str, channel_id: str, limit: int = 20) -> List[dict]:
-    client = WebClient(token=bot_token)
+HISTORY_PAGE_SIZE = 200
+
+
+def _client(bot_token: str) -> WebClient:
+    return WebClient(token=bot_token, base_url=settings.SLACK_BASE_URL)
+
+
+def get_channel_messages(
+    bot_token: str,
+    channel_id: str,
+    limit: int = 20,
+    oldest: Optional[str] = None,
+    channel_name: Optional[str] = None,
+) -> dict:
+    # Without oldest: the latest `limit` messages. With oldest: every message
+    # newer than that ts, up to SLACK_SYNC_MAX_MESSAGES. History pages come
+    # newest first, so past the cap only the oldest messages are kept and
+    # latest_ts stops at them: the next sync resumes there instead of jumping
+    # over the gap. latest_ts also covers skipped bot/system messages.
+    client = _client(bot_token)
     try:
-        # Get channel info
-        channel_info = client.conversations_info(channel=channel_id)
-        channel_name = channel_info["channel"]["name"]
+        # Channel names are cached by the caller; only look up unknown ones
+        if not channel_name:
+            channel_info = client.conversations_info(channel=channel_id)
+            channel_name = channel_info["channel"]["name"]
+
+        truncated = False
+        if oldest is None:
+            result = client.conversations_history(channel=channel_id, limit=limit)
+            raw = list(result["messages"])
+        else:
+            window = deque(maxlen=settings.SLACK_SYNC_MAX_MESSAGES)
+            cursor = None
+            while True:
+                result = client.conversations_history(
+                    channel=channel_id,
+                    oldest=oldest,
+                    limit=HISTORY_PAGE_SIZE,
+                    cursor=cursor,
+                )
+                for msg in result["messages"]:
+                    if len(window) == window.maxlen:
+                        truncated = True
+                    window.append(msg)
+                cursor = (result.get("response_metadata") or {}).get("next_cursor")
+                if not cursor or not result.get("has_more"):
+                    break
+            raw = list(window)
+            if truncated:
+                logger.warning(
+                    "Slack sync of %s has more than %d new messages; importing the oldest, "
+                    "the rest follow on the next sync",
+                    channel_id, len(raw),
+                )
 
-        # Get messages
-        result = client.conversations_history(channel=channel_id, limit=limit)
         messages = []
-        for msg in result["messages"]:
+        for msg in raw:
             # Skip bot messages and system messages
             if msg.get("subtype") or not msg.get("text"):
                 continue
@@ -24,13 +74,19 @@ def get_channel_messages(bot_token: str, channel_id: str, limit: int = 20) -> Li
                 "channel": channel_id,
                 "channel_name": channel_name,
             })
-        return messages
+        latest_ts = max((msg["ts"] for msg in raw), key=float, default=None)
+        return {
+            "channel_name": channel_name,
+            "messages": messages,
+            "latest_ts": latest_ts,
+            "truncated": truncated,
+        }
     except SlackApiError as e:
         raise ValueError(f"Slack API error: {e.response['error']}")
 
 
 def list_channels(bot_token: str) -> List[dict]:
-    client = WebClient(token=bot_token)
+    client = _client(bot_token)
     try:
         result = client.conversations_list(types="public_channel,private_channel", limit=200)
         return [
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, Optional, Protocol, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+# ── Token buckets ─────────────────────────────────────────────────────────────
+
+class BucketBackend(Protocol):
+    # Takes `amount` if available and returns 0, else the seconds to wait
+    async def take(self, bucket: str, amount: float, capacity: float, per_second: float) -> float: ...
+
+
+class MemoryBackend:
+    # Per process: with several workers each one enforces the full limit, so
+    # divide the configured limits by the worker count or use LLM_LIMITER_URL
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, bucket: str, amount: float, capacity: float, per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(bucket, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * per_second)
+        if tokens >= amount:
+            self._buckets[bucket] = (tokens - amount, now)
+            return 0.0
+        self._buckets[bucket] = (tokens, now)
+        return (amount - tokens) / per_second
+
+
+# Refill and take in one step on the Redis server, using its clock
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local per_second = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * per_second)
+local wait = 0
+if tokens >= amount then
+  tokens = tokens - amount
+else
+  wait = (amount - tokens) / per_second
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / per_second) + 60)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    # Shared by every worker and replica, so the limits hold for the deployment
+    def __init__(self, url: str):
+        import redis.asyncio  # imported only when LLM_LIMITER_URL is set
+
+        self._redis = redis.asyncio.Redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+
+    async def take(self, bucket: str, amount: float, capacity: float, per_second: float) -> float:
+        wait = await self._take(keys=[f"llm-limit:{bucket}"], args=[capacity, per_second, amount])
+        return float(wait)
+
+
+_backend: Optional[BucketBackend] = None
+
+
+def set_backend(backend: Optional[BucketBackend]) -> None:
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> BucketBackend:
+    global _backend
+    if _backend is None:
+        _backend = RedisBackend(settings.LLM_LIMITER_URL) if settings.LLM_LIMITER_URL else MemoryBackend()
+    return _backend
+
+
+async def _acquire(bucket: str, amount: float, per_minute: int) -> None:
+    if per_minute <= 0:
+        return
+    # A request bigger than a whole minute's budget waits for a full bucket
+    amount = min(amount, per_minute)
+    while True:
+        wait = await get_backend().take(bucket, amount, per_minute, per_minute / 60.0)
+        if wait <= 0:
+            return
+        await asyncio.sleep(wait)
+
+
+async def acquire_rate(bucket: str, per_second: float) -> None:
+    # One request on an evenly spaced per-second limit (bucket of one)
+    if per_second <= 0:
+        return
+    while True:
+        wait = await get_backend().take(bucket, 1, 1, per_second)
+        if wait <= 0:
+            return
+        await asyncio.sleep(wait)
+
+
+async def acquire(input_tokens: int) -> None:
+    # Waits until one request and its input tokens fit the per-minute limits
+    await _acquire("requests", 1, settings.ANTHROPIC_REQUESTS_PER_MINUTE)
+    await _acquire("input_tokens", input_tokens, settings.ANTHROPIC_INPUT_TOKENS_PER_MINUTE)
+
+
+# ── Backoff ───────────────────────────────────────────────────────────────────
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    # Full jitter, so workers throttled together don't retry together
+    if retry_after is not None:
+        return min(retry_after, settings.LLM_RETRY_MAX_DELAY) + random.uniform(0, 1)
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+# ── Circuit breaker ───────────────────────────────────────────────────────────
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive transient failures. While open the
+    # worker stops claiming jobs; after `cooldown` one trial is let through
+    # (half-open) and its outcome closes or re-opens the circuit.
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+
+    @property
+    def state(self) -> str:
+        if self._failures < self.threshold:
+            return "closed"
+        return "open" if time.monotonic() < self._open_until else "half_open"
+
+    def check(self) -> None:
+        if self.state == "open":
+            raise CircuitOpen("Anthropic API circuit is open")
+
+    def record_success(self) -> None:
+        if self._failures >= self.threshold:
+            logger.info("Anthropic API circuit closed")
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.threshold:
+            if self._open_until < time.monotonic():
+                logger.warning("Anthropic API circuit open for %ss", self.cooldown)
+            self._open_until = time.monotonic() + self.cooldown
+
+    def claim_limit(self, free: int) -> int:
+        state = self.state
+        if state == "open":
+            return 0
+        return min(free, 1) if state == "half_open" else free
+
+
+breaker = CircuitBreaker(
+    threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    cooldown=settings.CIRCUIT_OPEN_SECONDS,
+)
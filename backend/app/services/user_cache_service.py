@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Protocol
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.config import settings
+from app import models
+
+# hashed_password is deliberately left out; it lazy-loads if a handler needs it
+CACHED_FIELDS = ("id", "email", "full_name", "is_admin", "is_active", "priority", "created_at")
+
+
+class UserCacheBackend(Protocol):
+    def get(self, user_id: int) -> Optional[dict]: ...
+
+    def set(self, user_id: int, snapshot: dict) -> None: ...
+
+    def delete(self, user_id: int) -> None: ...
+
+    async def get_async(self, user_id: int) -> Optional[dict]: ...
+
+    async def set_async(self, user_id: int, snapshot: dict) -> None: ...
+
+
+class MemoryBackend:
+    # Per process: with several workers, an invalidation only reaches the
+    # worker that made it and the others catch up within the TTL
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, snapshot = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def set(self, user_id: int, snapshot: dict) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    # Never waits on I/O, so the event loop can call it directly
+    async def get_async(self, user_id: int) -> Optional[dict]:
+        return self.get(user_id)
+
+    async def set_async(self, user_id: int, snapshot: dict) -> None:
+        self.set(user_id, snapshot)
+
+
+class RedisBackend:
+    # Shared by every worker and replica, so invalidation is immediate everywhere.
+    # The sync client serves threadpool callers; the event loop uses the
+    # asyncio client so a round trip never blocks it.
+    def __init__(self, url: str, ttl: float):
+        import redis  # imported only when USER_CACHE_URL is set
+        import redis.asyncio
+
+        self.ttl = int(ttl)
+        self._redis = redis.Redis.from_url(url)
+        self._redis_async = redis.asyncio.Redis.from_url(url)
+
+    def _key(self, user_id: int) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def _load(raw) -> Optional[dict]:
+        if raw is None:
+            return None
+        snapshot = json.loads(raw)
+        snapshot["created_at"] = datetime.fromisoformat(snapshot["created_at"])
+        return snapshot
+
+    @staticmethod
+    def _dump(snapshot: dict) -> str:
+        return json.dumps({**snapshot, "created_at": snapshot["created_at"].isoformat()})
+
+    def get(self, user_id: int) -> Optional[dict]:
+        return self._load(self._redis.get(self._key(user_id)))
+
+    def set(self, user_id: int, snapshot: dict) -> None:
+        self._redis.setex(self._key(user_id), self.ttl, self._dump(snapshot))
+
+    def delete(self, user_id: int) -> None:
+        self._redis.delete(self._key(user_id))
+
+    async def get_async(self, user_id: int) -> Optional[dict]:
+        return self._load(await self._redis_async.get(self._key(user_id)))
+
+    async def set_async(self, user_id: int, snapshot: dict) -> None:
+        await self._redis_async.setex(self._key(user_id), self.ttl, self._dump(snapshot))
+
+
+def _default_backend() -> UserCacheBackend:
+    if settings.USER_CACHE_URL:
+        return RedisBackend(settings.USER_CACHE_URL, settings.USER_CACHE_TTL_SECONDS)
+    return MemoryBackend(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_ENTRIES)
+
+
+_backend: Optional[UserCacheBackend] = None
+
+
+def set_backend(backend: Optional[UserCacheBackend]) -> None:
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> UserCacheBackend:
+    global _backend
+    if _backend is None:
+        _backend = _default_backend()
+    return _backend
+
+
+def get(user_id: int) -> Optional[dict]:
+    if not settings.USER_CACHE_ENABLED:
+        return None
+    return get_backend().get(user_id)
+
+
+async def get_async(user_id: int) -> Optional[dict]:
+    if not settings.USER_CACHE_ENABLED:
+        return None
+    return await get_backend().get_async(user_id)
+
+
+def _snapshot(user: models.User) -> dict:
+    return {field: getattr(user, field) for field in CACHED_FIELDS}
+
+
+def put(user: models.User) -> None:
+    if settings.USER_CACHE_ENABLED:
+        get_backend().set(user.id, _snapshot(user))
+
+
+async def put_async(user: models.User) -> None:
+    if settings.USER_CACHE_ENABLED:
+        await get_backend().set_async(user.id, _snapshot(user))
+
+
+def invalidate(user_id: int) -> None:
+    if settings.USER_CACHE_ENABLED:
+        get_backend().delete(user_id)
+
+
+def attach(db: Session, snapshot: dict) -> models.User:
+    # Rebuild a persistent User in this session without a SELECT, so handlers
+    # can still modify and commit it
+    user = models.User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
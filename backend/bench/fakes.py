@@ -0,0 +1,405 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.05  # seconds before the first byte
+    jitter: float = 0.0  # +/- uniform, seconds
+    error_rate: float = 0.0  # share of requests answered with an error
+    # Anthropic
+    stream_chunks: int = 40
+    chunk_delay: float = 0.01  # seconds between streamed text chunks
+    response_chars: int = 1500  # size of suggested_rewrite
+    batch_seconds: float = 2.0  # a Message Batch stays in_progress this long
+    # Slack
+    message_count: int = 500
+    message_chars: int = 200
+    duplicate_rate: float = 0.1  # share of Slack messages repeating an earlier one
+    # Notion
+    page_count: int = 50
+    blocks_per_page: int = 30
+
+
+async def _delay(config: FakeConfig) -> None:
+    await asyncio.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+
+
+def sample_text(chars: int, seed: int) -> str:
+    words = ["launch", "offer", "limited", "guaranteed", "team", "customers", "today",
+             "new", "best", "results", "free", "trial", "brand", "value", "growth"]
+    rng = random.Random(seed)
+    out = []
+    while sum(len(w) + 1 for w in out) < chars:
+        out.append(rng.choice(words))
+    return " ".join(out)[:chars]
+
+
+# ── Anthropic ─────────────────────────────────────────────────────────────────
+
+# Content containing this marker is "hard": answered with low confidence
+# unless the request enables thinking, so routes with escalate re-run it
+HARD_MARKER = "[hard-case]"
+
+
+def _analysis(config: FakeConfig, seed: int, confidence: float = 0.9) -> str:
+    rng = random.Random(seed)
+    return json.dumps({
+        "brand_score": rng.randint(40, 95),
+        "brand_feedback": sample_text(200, seed),
+        "compliance_flags": [
+            {"text": "guaranteed", "issue": "Unsubstantiated claim", "severity": rng.choice(["low", "medium"]),
+             "suggestion": "designed to"},
+        ],
+        "sentiment": rng.choice(["positive", "neutral", "negative"]),
+        "sentiment_score": round(rng.random(), 2),
+        "sentiment_feedback": sample_text(120, seed + 1),
+        "suggested_rewrite": sample_text(config.response_chars, seed + 2),
+        "overall_rating": rng.choice("ABCDF"),
+        "summary": sample_text(200, seed + 3),
+        "confidence": confidence,
+    })
+
+
+def _thinking(body: dict) -> str:
+    # Thinking text when the request enables it, "" otherwise
+    if (body.get("thinking") or {}).get("type") in ("adaptive", "enabled"):
+        return "Checking the claims against the guidelines before scoring."
+    return ""
+
+
+def _invalid_thinking(body: dict) -> str:
+    thinking = body.get("thinking")
+    if thinking is None:
+        return ""
+    if thinking.get("type") not in ("adaptive", "enabled", "disabled"):
+        return f"thinking.type: unknown value {thinking.get('type')!r}"
+    if thinking["type"] == "enabled" and not (
+        1024 <= thinking.get("budget_tokens", 0) < body.get("max_tokens", 0)
+    ):
+        return "thinking.budget_tokens: must be at least 1024 and less than max_tokens"
+    return ""
+
+
+def _message(model: str, text: str, input_tokens: int, thinking: str = "") -> dict:
+    content = [{"type": "text", "text": text}]
+    if thinking:
+        content.insert(0, {"type": "thinking", "thinking": thinking, "signature": "fake-signature"})
+    return {
+        "id": f"msg_{random.getrandbits(48):x}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": content,
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": (len(thinking) + len(text)) // 4},
+    }
+
+
+def _answer(config: FakeConfig, body: dict) -> tuple:
+    # (analysis text, thinking text, input tokens) for a Messages request body
+    prompt = json.dumps(body.get("messages"))
+    thinking = _thinking(body)
+    hard = HARD_MARKER in prompt and not thinking
+    return _analysis(config, zlib.crc32(prompt.encode()), 0.3 if hard else 0.9), thinking, len(prompt) // 4
+
+
+def _batch_result(config: FakeConfig, request: dict) -> dict:
+    params = request.get("params", {})
+    invalid = _invalid_thinking(params)
+    if invalid:
+        result = {"type": "errored", "error": {
+            "type": "error", "error": {"type": "invalid_request_error", "message": invalid},
+        }}
+    else:
+        text, thinking, input_tokens = _answer(config, params)
+        result = {"type": "succeeded", "message": _message(params.get("model", "fake"), text, input_tokens, thinking)}
+    return {"custom_id": request.get("custom_id"), "result": result}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def anthropic_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        await _delay(config)
+        if random.random() < config.error_rate:
+            return JSONResponse(
+                {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+                status_code=529,
+                headers={"retry-after": "1"},
+            )
+        invalid = _invalid_thinking(body)
+        if invalid:
+            return JSONResponse(
+                {"type": "error", "error": {"type": "invalid_request_error", "message": invalid}},
+                status_code=400,
+            )
+        text, thinking, input_tokens = _answer(config, body)
+        model = body.get("model", "fake")
+        if not body.get("stream"):
+            return _message(model, text, input_tokens, thinking)
+
+        async def stream():
+            start = _message(model, "", input_tokens)
+            start.update(content=[], stop_reason=None)
+            start["usage"]["output_tokens"] = 1
+            yield _sse("message_start", {"type": "message_start", "message": start})
+            index = 0
+            if thinking:
+                yield _sse("content_block_start", {
+                    "type": "content_block_start", "index": 0,
+                    "content_block": {"type": "thinking", "thinking": "", "signature": ""},
+                })
+                yield _sse("content_block_delta", {
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": "thinking_delta", "thinking": thinking},
+                })
+                yield _sse("content_block_delta", {
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": "signature_delta", "signature": "fake-signature"},
+                })
+                yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+                index = 1
+            yield _sse("content_block_start", {
+                "type": "content_block_start", "index": index,
+                "content_block": {"type": "text", "text": ""},
+            })
+            size = max(1, len(text) // config.stream_chunks)
+            for i in range(0, len(text), size):
+                await asyncio.sleep(config.chunk_delay)
+                yield _sse("content_block_delta", {
+                    "type": "content_block_delta", "index": index,
+                    "delta": {"type": "text_delta", "text": text[i:i + size]},
+                })
+            yield _sse("content_block_stop", {"type": "content_block_stop", "index": index})
+            yield _sse("message_delta", {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": (len(thinking) + len(text)) // 4},
+            })
+            yield _sse("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    # Message Batches: a batch ends batch_seconds after it is created and its
+    # results are answered like individual non-streaming requests
+    batches: dict = {}
+
+    def _batch(batch_id: str) -> dict:
+        batch = batches[batch_id]
+        ended = time.time() >= batch["created"] + config.batch_seconds
+        count = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count, "succeeded": count if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "results_url": f"/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def _missing(batch_id: str) -> JSONResponse:
+        return JSONResponse(
+            {"type": "error", "error": {"type": "not_found_error", "message": f"No batch {batch_id}"}},
+            status_code=404,
+        )
+
+    @app.post("/v1/messages/batches")
+    async def create_batch(request: Request):
+        body = await request.json()
+        await _delay(config)
+        batch_id = f"msgbatch_{random.getrandbits(48):x}"
+        batches[batch_id] = {"created": time.time(), "requests": body.get("requests", [])}
+        return _batch(batch_id)
+
+    @app.get("/v1/messages/batches/{batch_id}")
+    async def retrieve_batch(batch_id: str):
+        return _batch(batch_id) if batch_id in batches else _missing(batch_id)
+
+    @app.get("/v1/messages/batches/{batch_id}/results")
+    async def batch_results(batch_id: str):
+        if batch_id not in batches:
+            return _missing(batch_id)
+
+        async def lines():
+            for request in batches[batch_id]["requests"]:
+                yield json.dumps(_batch_result(config, request)) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-jsonl")
+
+    return app
+
+
+# ── Slack ─────────────────────────────────────────────────────────────────────
+
+def slack_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI()
+    base_ts = time.time() - 86400
+
+    def _messages():
+        messages = []
+        for i in range(config.message_count):
+            seed = i - 1 if i and random.Random(i).random() < config.duplicate_rate else i
+            messages.append({
+                "type": "message",
+                "ts": f"{base_ts + i:.6f}",
+                "user": f"U{i % 17:04d}",
+                "text": sample_text(config.message_chars, seed),
+            })
+        return list(reversed(messages))  # newest first, like Slack
+
+    async def _params(request: Request) -> dict:
+        params = dict(request.query_params)
+        params.update(dict(await request.form()))
+        return params
+
+    @app.api_route("/api/conversations.info", methods=["GET", "POST"])
+    async def conversations_info(request: Request):
+        params = await _params(request)
+        await _delay(config)
+        channel = params.get("channel") or "CBENCH"
+        return {"ok": True, "channel": {"id": channel, "name": channel.lower()}}
+
+    @app.api_route("/api/conversations.history", methods=["GET", "POST"])
+    async def conversations_history(request: Request):
+        params = await _params(request)
+        await _delay(config)
+        if random.random() < config.error_rate:
+            return JSONResponse({"ok": False, "error": "ratelimited"}, status_code=429,
+                                headers={"Retry-After": "1"})
+        messages = _messages()
+        if params.get("oldest"):
+            messages = [m for m in messages if float(m["ts"]) > float(params["oldest"])]
+        offset = int(params.get("cursor") or 0)
+        limit = int(params.get("limit") or 100)
+        page = messages[offset:offset + limit]
+        more = offset + limit < len(messages)
+        return {
+            "ok": True,
+            "messages": page,
+            "has_more": more,
+            "response_metadata": {"next_cursor": str(offset + limit) if more else ""},
+        }
+
+    @app.api_route("/api/conversations.list", methods=["GET", "POST"])
+    async def conversations_list():
+        await _delay(config)
+        return {"ok": True, "channels": [{"id": "CBENCH", "name": "cbench", "is_private": False}]}
+
+    return app
+
+
+# ── Notion ────────────────────────────────────────────────────────────────────
+
+def notion_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI()
+    edited = "2026-01-01T00:00:00.000Z"
+
+    def _page(i: int) -> dict:
+        return {
+            "object": "page",
+            "id": f"page-{i}",
+            "url": f"https://notion.so/page-{i}",
+            "last_edited_time": edited,
+            "properties": {"Name": {"type": "title", "title": [{"plain_text": f"Page {i}"}]}},
+        }
+
+    def _error():
+        return JSONResponse(
+            {"object": "error", "status": 429, "code": "rate_limited", "message": "Rate limited"},
+            status_code=429,
+            headers={"retry-after": "1"},
+        )
+
+    @app.post("/v1/databases/{database_id}/query")
+    async def query_database(database_id: str, request: Request):
+        body = await request.json()
+        await _delay(config)
+        if random.random() < config.error_rate:
+            return _error()
+        offset = int(body.get("start_cursor") or 0)
+        size = int(body.get("page_size") or 100)
+        end = min(offset + size, config.page_count)
+        more = end < config.page_count
+        return {
+            "object": "list",
+            "results": [_page(i) for i in range(offset, end)],
+            "has_more": more,
+            "next_cursor": str(end) if more else None,
+        }
+
+    @app.get("/v1/blocks/{block_id}/children")
+    async def block_children(block_id: str):
+        await _delay(config)
+        if random.random() < config.error_rate:
+            return _error()
+        seed = int(block_id.rsplit("-", 1)[-1]) if block_id[-1].isdigit() else 0
+        return {
+            "object": "list",
+            "results": [
+                {
+                    "object": "block",
+                    "id": f"{block_id}-b{j}",
+                    "type": "paragraph",
+                    "has_children": False,
+                    "paragraph": {"rich_text": [{"plain_text": sample_text(160, seed * 1000 + j)}]},
+                }
+                for j in range(config.blocks_per_page)
+            ],
+            "has_more": False,
+            "next_cursor": None,
+        }
+
+    @app.post("/v1/search")
+    async def search():
+        await _delay(config)
+        return {"object": "list", "results": [
+            {"object": "database", "id": "db-bench", "title": [{"plain_text": "Bench"}]}
+        ]}
+
+    return app
+
+
+# ── Serving ───────────────────────────────────────────────────────────────────
+
+class ServerThread:
+    # Runs an ASGI app with uvicorn on its own thread and event loop
+    def __init__(self, app, port: int):
+        self.port = port
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "ServerThread":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
@@ -0,0 +1,273 @@
+import asyncio
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import httpx
+from sqlalchemy import create_engine, delete, event, func, insert, select
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    # Nearest-rank
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_stats(prefix: str, seconds: List[float]) -> dict:
+    return {
+        f"{prefix}p50_ms": _ms(percentile(seconds, 50)),
+        f"{prefix}p95_ms": _ms(percentile(seconds, 95)),
+        f"{prefix}p99_ms": _ms(percentile(seconds, 99)),
+    }
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 1000, 2)
+
+
+class QueryCounter:
+    # Counts statements the app sends to the database
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        with self._lock:
+            self.count += 1
+
+
+class RssSampler:
+    # Peak resident set size of this process (app, worker and fakes included)
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * PAGE_SIZE
+        except OSError:
+            # ru_maxrss is KB on Linux, bytes on macOS; only a lifetime peak
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self.peak = self.current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+
+class Measurement:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.extra: Dict[str, float] = {}
+
+
+class Bench:
+    def __init__(self, base_url: str, database_url: str, counter: QueryCounter, args):
+        self.base_url = base_url
+        self.database_url = database_url
+        self.counter = counter
+        self.args = args
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=300)
+        # The harness polls and seeds through its own engine so its queries
+        # never show up in the app's counts
+        self.probe = create_engine(database_url)
+        self.token: Optional[str] = None
+        self.user_id: Optional[int] = None
+        self._current: Optional[Measurement] = None
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        self.probe.dispose()
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    async def login(self, email: str = "bench@example.com", password: str = "bench-password") -> None:
+        response = await self.client.post(
+            "/api/auth/register", json={"email": email, "password": password, "full_name": "Bench"}
+        )
+        if response.status_code == 400:
+            response = await self.client.post(
+                "/api/auth/login", json={"email": email, "password": password}
+            )
+        response.raise_for_status()
+        body = response.json()
+        self.token = body["access_token"]
+        self.user_id = body["user"]["id"]
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        # Timed and counted against the current measurement
+        kwargs.setdefault("headers", self.headers)
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            if self._current is not None:
+                self._current.errors += 1
+            raise
+        if self._current is not None:
+            self._current.latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                self._current.errors += 1
+        return response
+
+    async def run_concurrently(self, jobs: Iterable, concurrency: int) -> list:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(job):
+            async with semaphore:
+                try:
+                    return await job()
+                except httpx.HTTPError:
+                    return None
+
+        return await asyncio.gather(*(run(job) for job in jobs))
+
+    def _finished(self, review_ids: List[int]) -> List[tuple]:
+        from app import models
+
+        with self.probe.connect() as conn:
+            return conn.execute(
+                select(models.Review.id, models.Review.status).where(
+                    models.Review.id.in_(review_ids), models.Review.status != "pending"
+                )
+            ).all()
+
+    async def wait_for_reviews(
+        self,
+        submitted: Dict[int, float],
+        expected: Optional[int] = None,
+        timeout: float = 600,
+    ) -> List[float]:
+        # Seconds from submission until each review completed. May start
+        # before submission ends: `submitted` is read again on every poll.
+        # Reviews that end in "error" are counted as errored, not completed.
+        expected = len(submitted) if expected is None else expected
+        done: Dict[int, float] = {}
+        failed: set = set()
+        deadline = time.perf_counter() + timeout
+        while len(done) + len(failed) < expected and time.perf_counter() < deadline:
+            remaining = [rid for rid in list(submitted) if rid not in done and rid not in failed]
+            finished = await asyncio.to_thread(self._finished, remaining) if remaining else []
+            now = time.perf_counter()
+            for review_id, status in finished:
+                if status == "completed":
+                    done[review_id] = now - submitted[review_id]
+                else:
+                    failed.add(review_id)
+            if len(done) + len(failed) < expected:
+                await asyncio.sleep(0.05)
+        if self._current is not None:
+            self._current.extra["incomplete"] = expected - len(done) - len(failed)
+            self._current.extra["errored"] = len(failed)
+        return list(done.values())
+
+    def review_count(self) -> int:
+        from app import models
+
+        with self.probe.connect() as conn:
+            return conn.execute(select(func.count(models.Review.id))).scalar()
+
+    def seed_reviews(self, count: int, batch: int = 5000) -> None:
+        from app import models
+        from app.models import utcnow
+        from datetime import timedelta
+
+        now = utcnow()
+        flags = [{"text": "guaranteed", "issue": "Unsubstantiated claim", "severity": "medium",
+                  "suggestion": "designed to"}]
+        with self.probe.begin() as conn:
+            for start in range(0, count, batch):
+                conn.execute(insert(models.Review), [
+                    {
+                        "user_id": self.user_id,
+                        "content_type": ("social_media", "blog", "email", "ad_copy")[i % 4],
+                        "original_content": f"Seeded review {i} " + "copy " * 60,
+                        "source": ("manual", "slack", "notion")[i % 3],
+                        "brand_score": 40 + i % 60,
+                        "compliance_flags": flags if i % 3 == 0 else [],
+                        "sentiment": ("positive", "neutral", "negative")[i % 3],
+                        "sentiment_score": (i % 100) / 100,
+                        "overall_rating": "ABCDF"[i % 5],
+                        "summary": "Seeded.",
+                        "status": "completed",
+                        "created_at": now - timedelta(minutes=i % 86400),
+                    }
+                    for i in range(start, min(start + batch, count))
+                ])
+
+    def resize_reviews(self, size: int) -> int:
+        # Seeds or deletes seeded rows (newest first) until the table holds
+        # `size` reviews; returns the real count, which stays above `size`
+        # when other scenarios left more than that
+        from app import models
+
+        missing = size - self.review_count()
+        if missing > 0:
+            self.seed_reviews(missing)
+        elif missing < 0:
+            with self.probe.begin() as conn:
+                extra = (
+                    select(models.Review.id)
+                    .where(models.Review.summary == "Seeded.")
+                    .order_by(models.Review.id.desc())
+                    .limit(-missing)
+                )
+                conn.execute(delete(models.Review).where(models.Review.id.in_(extra)))
+        return self.review_count()
+
+    @contextmanager
+    def measure(self, results: dict):
+        # Fills `results` with throughput, latency, query and memory numbers
+        measurement = Measurement()
+        self._current = measurement
+        queries_before = self.counter.count
+        sampler = RssSampler()
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            yield measurement
+        finally:
+            wall = time.perf_counter() - started
+            peak = sampler.stop()
+            self._current = None
+            requests = len(measurement.latencies)
+            queries = self.counter.count - queries_before
+            results.update({
+                "requests": requests,
+                "errors": measurement.errors,
+                "wall_s": round(wall, 3),
+                "throughput_rps": round(requests / wall, 2) if wall else None,
+                **latency_stats("", measurement.latencies),
+                "queries": queries,
+                "queries_per_request": round(queries / requests, 2) if requests else None,
+                "peak_rss_mb": round(peak / 2**20, 1),
+                **measurement.extra,
+            })
@@ -0,0 +1,223 @@
+# End-to-end benchmark: boots the app with uvicorn against fake Anthropic,
+# Slack and Notion servers and drives it over HTTP.
+#
+#   cd backend
+#   python -m bench.run                                 # all scenarios
+#   python -m bench.run -s single_reviews -s dashboard_reads
+#   python -m bench.run -s login_storm --concurrency 50   # bcrypt vs. other endpoints
+#   python -m bench.run -s data_layer                      # sync vs. async sessions
+#   python -m bench.run -s sqlite_contention               # DB_PROFILE default vs. tuned
+#   python -m bench.run -s routing                         # every route to completed; fails on error
+#   python -m bench.run -s batch_import                    # Message Batch import to completed
+#   python -m bench.run --save-baseline bench/baseline.json
+#   python -m bench.run --compare bench/baseline.json   # exit 1 on regression
+#
+# Runs against a throwaway SQLite file unless --database-url is given. Use
+# the same flags when comparing against a baseline.
+#
+# bench/baseline.json is the committed baseline: every scenario with default
+# flags on SQLite. Timings are machine-specific, so regenerate it on the
+# machine that runs --compare, and again after any intended performance
+# change, with the --save-baseline command above; commit the new file.
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+from typing import Optional
+from bench.fakes import FakeConfig, ServerThread, anthropic_app, notion_app, slack_app
+
+# Higher is better for these and any "..._per_s" rate; everything else
+# (latency, queries, memory) lower
+HIGHER_IS_BETTER = ("throughput_rps",)
+# Differences under this many ms are noise regardless of percentage
+MIN_MS_DELTA = 2.0
+# Describe the workload rather than measure it
+SIZE_KEYS = ("requests", "wall_s", "rows", "imported", "calls")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench.run")
+    parser.add_argument("-s", "--scenario", action="append", dest="scenarios",
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    parser.add_argument("--reviews", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--slack-messages", type=int, default=500)
+    parser.add_argument("--dashboard-rows", type=int, default=10000)
+    parser.add_argument("--growth-sizes", type=lambda v: [int(x) for x in v.split(",")],
+                        default=[1000, 10000, 50000])
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--worker-concurrency", type=int, default=8)
+    parser.add_argument("--storm-users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--contention-seconds", type=float, default=5.0)
+    # Fake upstreams
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.01)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--response-chars", type=int, default=1500)
+    parser.add_argument("--batch-seconds", type=float, default=2.0, help="Message Batch processing time")
+    parser.add_argument("--slack-latency", type=float, default=0.05)
+    parser.add_argument("--notion-latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Slack/Notion error rate")
+    # Output
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, urls: dict) -> str:
+    # Must run before anything imports app.config
+    database_url = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="bench-"), "bench.db"
+    )
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": "bench",
+        "ANTHROPIC_API_KEY": "bench",
+        "ANTHROPIC_BASE_URL": urls["anthropic"],
+        "SLACK_BASE_URL": urls["slack"] + "/api/",
+        "NOTION_BASE_URL": urls["notion"],
+        "WORKER_ENABLED": "true",
+        "DB_AUTO_MIGRATE": "true",
+        "WORKER_CONCURRENCY": str(args.worker_concurrency),
+        # New jobs wake the in-process worker directly; a long idle poll keeps
+        # its claim queries out of the dashboard numbers
+        "WORKER_POLL_INTERVAL": "5",
+        # Picks up ended fake batches within a second of --batch-seconds
+        "BATCH_POLL_INTERVAL": "1",
+    })
+    return database_url
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, metrics in results.items():
+        for key, value in metrics.items():
+            before = baseline.get(name, {}).get(key)
+            if key.split("@")[0] in SIZE_KEYS or not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                continue
+            if key.endswith("errors") or key in ("incomplete", "errored", "failed_submissions"):
+                if value > before:
+                    regressions.append((name, key, before, value, None))
+                continue
+            if not before or ("_ms" in key and abs(value - before) < MIN_MS_DELTA):
+                continue
+            change = (value - before) / before
+            higher_is_better = key in HIGHER_IS_BETTER or key.endswith("_per_s")
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append((name, key, before, value, change))
+    return regressions
+
+
+def print_results(results: dict, baseline: Optional[dict]) -> None:
+    for name, metrics in results.items():
+        print(f"\n{name}")
+        for key, value in metrics.items():
+            line = f"  {key:<28} {value}"
+            before = (baseline or {}).get(name, {}).get(key)
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+                line += f"   (baseline {before}, {100 * (value - before) / before:+.1f}%)"
+            print(line)
+
+
+async def run_scenarios(args, app_url: str, database_url: str, counter) -> dict:
+    from bench.harness import Bench
+    from bench.scenarios import SCENARIOS
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}; have {', '.join(SCENARIOS)}")
+
+    bench = Bench(app_url, database_url, counter, args)
+    results = {}
+    try:
+        await bench.login()
+        for name in names:
+            print(f"running {name} ...", file=sys.stderr)
+            results[name] = await SCENARIOS[name](bench)
+    finally:
+        await bench.close()
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    fakes = {
+        "anthropic": ServerThread(anthropic_app(FakeConfig(
+            latency=args.llm_latency,
+            chunk_delay=args.llm_chunk_delay,
+            error_rate=args.llm_error_rate,
+            response_chars=args.response_chars,
+            batch_seconds=args.batch_seconds,
+        )), _free_port()),
+        "slack": ServerThread(slack_app(FakeConfig(
+            latency=args.slack_latency, error_rate=args.error_rate, message_count=args.slack_messages,
+        )), _free_port()),
+        "notion": ServerThread(notion_app(FakeConfig(
+            latency=args.notion_latency, error_rate=args.error_rate,
+        )), _free_port()),
+    }
+    for server in fakes.values():
+        server.start()
+    database_url = configure_environment(args, {name: s.url for name, s in fakes.items()})
+
+    from app.database import async_engine, engine
+    from app.main import app
+    from bench.harness import QueryCounter
+
+    counter = QueryCounter()
+    counter.attach(engine)
+    counter.attach(async_engine.sync_engine)
+    server = ServerThread(app, _free_port()).start()
+    try:
+        results = asyncio.run(run_scenarios(args, server.url, database_url, counter))
+    finally:
+        server.stop()
+        for fake in fakes.values():
+            fake.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    # Reviews that ended in "error" make the numbers meaningless: a failed
+    # analysis is much faster than a real one
+    failed = {name: m["errored"] for name, m in results.items() if m.get("errored")}
+    for name, count in failed.items():
+        print(f"FAILED {name}: {count} review(s) ended in error")
+
+    paths = [args.output] + ([] if failed else [args.save_baseline])
+    for path in filter(None, paths):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nwrote {path}")
+    if failed:
+        return 1
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, key, before, value, change in regressions:
+            delta = f" ({100 * change:+.1f}%)" if change is not None else ""
+            print(f"REGRESSION {name}.{key}: {before} -> {value}{delta}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,507 @@
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+from bench.fakes import HARD_MARKER, sample_text
+from bench.harness import Bench, latency_stats
+
+# name -> async fn(bench) -> results dict; run in registration order
+SCENARIOS: Dict[str, Callable] = {}
+
+
+def scenario(name: str):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+@scenario("single_reviews")
+async def single_reviews(bench: Bench) -> dict:
+    # Interactive POST /api/reviews/ traffic, each with unique content so
+    # every one is a real (fake) model call; measures request latency and
+    # time until the worker has finished each review
+    count, concurrency = bench.args.reviews, bench.args.concurrency
+    salt = int(time.time())
+    submitted: Dict[int, float] = {}
+    results: dict = {}
+
+    async def submit(i: int):
+        started = time.perf_counter()
+        response = await bench.request("POST", "/api/reviews/", json={
+            "content_type": ("social_media", "email", "ad_copy", "blog")[i % 4],
+            "original_content": f"{sample_text(400, salt + i)} #{salt}-{i}",
+        })
+        if response.status_code == 202:
+            submitted[response.json()["id"]] = started
+
+    with bench.measure(results) as measurement:
+        waiter = asyncio.create_task(bench.wait_for_reviews(submitted, expected=count))
+        await bench.run_concurrently([lambda i=i: submit(i) for i in range(count)], concurrency)
+        if len(submitted) < count:
+            measurement.extra["failed_submissions"] = count - len(submitted)
+            waiter.cancel()
+            completions = await bench.wait_for_reviews(submitted)
+        else:
+            completions = await waiter
+    results.update(latency_stats("completion_", completions))
+    results["completed_per_s"] = round(len(completions) / results["wall_s"], 2)
+    return results
+
+
+# Extra rule for the routing scenario: a fixed thinking budget, which no
+# default route uses
+BUDGET_ROUTE = {
+    "name": "bench_budget",
+    "sources": ["bench_budget"],
+    "model": "claude-sonnet-4-5",
+    "thinking": 2048,
+    "max_tokens": 4096,
+}
+
+# route case -> (review fields, expected analysis_route, expected model or
+# None for ANTHROPIC_MODEL, expected analysis_escalated)
+ROUTE_CASES = {
+    "adaptive": ({"content_type": "blog", "chars": 1500}, "default", None, False),
+    "budget": (
+        {"content_type": "blog", "chars": 1500, "source": "bench_budget"},
+        "bench_budget", "claude-sonnet-4-5", False,
+    ),
+    "no_thinking": ({"content_type": "social_media", "chars": 400}, "short_form", "claude-haiku-4-5", False),
+    # Low confidence on the cheap route: re-run with adaptive thinking
+    "escalated": ({"content_type": "social_media", "chars": 400, "hard": True}, "short_form", None, True),
+}
+
+
+def _review_routes(bench: Bench, review_ids: list) -> dict:
+    from sqlalchemy import select
+    from app import models
+
+    with bench.probe.connect() as conn:
+        rows = conn.execute(
+            select(
+                models.Review.id,
+                models.Review.analysis_route,
+                models.Review.analysis_model,
+                models.Review.analysis_escalated,
+            ).where(models.Review.id.in_(review_ids))
+        ).all()
+    return {
+        row.id: (row.analysis_route, row.analysis_model, bool(row.analysis_escalated)) for row in rows
+    }
+
+
+@scenario("routing")
+async def routing(bench: Bench) -> dict:
+    # Every routing path end to end through the fake upstream: adaptive
+    # thinking, a thinking budget, no thinking and escalation from no
+    # thinking to adaptive. Fails if any review ends in error or takes a
+    # different route, model or escalation than expected.
+    from app.config import settings
+
+    per_case = max(1, bench.args.reviews // 20)
+    salt = int(time.time())
+    submitted: Dict[int, float] = {}
+    expected: Dict[int, tuple] = {}
+    results: dict = {}
+
+    async def submit(case: str, i: int):
+        fields, route, model, escalated = ROUTE_CASES[case]
+        marker = f" {HARD_MARKER}" if fields.get("hard") else ""
+        started = time.perf_counter()
+        response = await bench.request("POST", "/api/reviews/", json={
+            "content_type": fields["content_type"],
+            "original_content": f"{sample_text(fields['chars'], salt + i)} #{case}-{salt}-{i}{marker}",
+            "source": fields.get("source", "manual"),
+            "bypass_cache": True,
+        })
+        if response.status_code == 202:
+            review_id = response.json()["id"]
+            submitted[review_id] = started
+            expected[review_id] = (route, model or settings.ANTHROPIC_MODEL, escalated)
+
+    routes = settings.ANALYSIS_ROUTES
+    settings.ANALYSIS_ROUTES = [BUDGET_ROUTE] + routes
+    try:
+        with bench.measure(results):
+            await bench.run_concurrently(
+                [lambda c=c, i=i: submit(c, i) for c in ROUTE_CASES for i in range(per_case)],
+                bench.args.concurrency,
+            )
+            completions = await bench.wait_for_reviews(submitted)
+    finally:
+        settings.ANALYSIS_ROUTES = routes
+
+    actual = await asyncio.to_thread(_review_routes, bench, list(submitted))
+    mismatched = {rid: (want, actual.get(rid)) for rid, want in expected.items() if actual.get(rid) != want}
+    if mismatched:
+        raise RuntimeError(f"routing: unexpected (route, model, escalated) for reviews {mismatched}")
+    results.update(latency_stats("completion_", completions))
+    return results
+
+
+async def _configure_slack(bench: Bench) -> None:
+    response = await bench.client.post(
+        "/api/integrations/slack/config",
+        json={"bot_token": "xoxb-bench", "channel_ids": ["CBENCH", "CBATCH"]},
+        headers=bench.headers,
+    )
+    response.raise_for_status()
+
+
+@scenario("slack_import")
+async def slack_import(bench: Bench) -> dict:
+    # One POST /api/integrations/slack/fetch of a channel with
+    # --slack-messages messages, then until every imported review is done
+    results: dict = {}
+    await _configure_slack(bench)
+
+    with bench.measure(results) as measurement:
+        started = time.perf_counter()
+        response = await bench.request(
+            "POST", "/api/integrations/slack/fetch",
+            params={"channel_id": "CBENCH", "limit": bench.args.slack_messages, "full": True},
+        )
+        response.raise_for_status()
+        body = response.json()
+        measurement.extra["imported"] = len(body["review_ids"])
+        completions = await bench.wait_for_reviews({rid: started for rid in body["review_ids"]})
+    results.update(latency_stats("completion_", completions))
+    results["completed_per_s"] = round(len(completions) / results["wall_s"], 2)
+    return results
+
+
+async def _read_stats(bench: Bench, reads: int) -> dict:
+    results: dict = {}
+    with bench.measure(results):
+        await bench.run_concurrently(
+            [lambda: bench.request("GET", "/api/dashboard/stats")] * reads,
+            bench.args.concurrency,
+        )
+    return results
+
+
+def _batched(bench: Bench, review_ids: list) -> tuple:
+    # (reviews still attached to a batch, ended batches); a review that fell
+    # back to the queue has its batch_id cleared
+    from sqlalchemy import func, select
+    from app import models
+
+    with bench.probe.connect() as conn:
+        attached = conn.execute(
+            select(func.count(models.Review.id)).where(
+                models.Review.id.in_(review_ids), models.Review.batch_id.is_not(None)
+            )
+        ).scalar()
+        ended = conn.execute(
+            select(func.count(models.AnalysisBatch.id)).where(models.AnalysisBatch.status == "ended")
+        ).scalar()
+    return attached, ended
+
+
+@scenario("batch_import")
+async def batch_import(bench: Bench) -> dict:
+    # A Slack import of --reviews messages with mode=batch: one Message Batch
+    # on the fake upstream, collected by the batch poller. Fails if any review
+    # ends in error or was analysed outside the batch.
+    results: dict = {}
+    await _configure_slack(bench)
+    with bench.measure(results) as measurement:
+        started = time.perf_counter()
+        response = await bench.request(
+            "POST", "/api/integrations/slack/fetch",
+            params={
+                "channel_id": "CBATCH", "limit": bench.args.reviews, "full": True,
+                "bypass_cache": True, "mode": "batch",
+            },
+        )
+        response.raise_for_status()
+        review_ids = response.json()["review_ids"]
+        measurement.extra["imported"] = len(review_ids)
+        completions = await bench.wait_for_reviews({rid: started for rid in review_ids})
+    # The poller marks the batch ended just after writing its results
+    for _ in range(50):
+        attached, ended = await asyncio.to_thread(_batched, bench, review_ids)
+        if ended:
+            break
+        await asyncio.sleep(0.1)
+    if attached != len(review_ids) or not ended:
+        raise RuntimeError(
+            f"batch_import: {len(review_ids) - attached} of {len(review_ids)} reviews left the batch, "
+            f"{ended} batch(es) ended"
+        )
+    results.update(latency_stats("completion_", completions))
+    return results
+
+
+@scenario("dashboard_reads")
+async def dashboard_reads(bench: Bench) -> dict:
+    # GET /api/dashboard/stats against --dashboard-rows reviews
+    missing = bench.args.dashboard_rows - bench.review_count()
+    if missing > 0:
+        await asyncio.to_thread(bench.seed_reviews, missing)
+    results = await _read_stats(bench, bench.args.reads)
+    results["rows"] = bench.review_count()
+    return results
+
+
+@scenario("dashboard_growth")
+async def dashboard_growth(bench: Bench) -> dict:
+    # Stats latency at each table size; rows@ is the real review count the
+    # measurement ran against. cold_ms@ is a cache miss, which scans the
+    # table and grows with it; p50/p95 are mostly served from the cache.
+    from app.services import dashboard_cache_service
+
+    results: dict = {}
+    for size in bench.args.growth_sizes:
+        results[f"rows@{size}"] = await asyncio.to_thread(bench.resize_reviews, size)
+        cold = []
+        for _ in range(3):
+            dashboard_cache_service.clear()
+            started = time.perf_counter()
+            (await bench.request("GET", "/api/dashboard/stats")).raise_for_status()
+            cold.append((time.perf_counter() - started) * 1000)
+        results[f"cold_ms@{size}"] = round(statistics.median(cold), 2)
+        step = await _read_stats(bench, max(10, bench.args.reads // 4))
+        results[f"p50_ms@{size}"] = step["p50_ms"]
+        results[f"p95_ms@{size}"] = step["p95_ms"]
+        results[f"queries_per_request@{size}"] = step["queries_per_request"]
+    return results
+
+
+async def _probe(bench: Bench, stop: asyncio.Event, count: Optional[int] = None) -> None:
+    # Light sync endpoints whose latency should not depend on password work
+    paths = ("/api/auth/me", "/api/reviews/?limit=20")
+    i = 0
+    while not stop.is_set() and (count is None or i < count):
+        await bench.request("GET", paths[i % len(paths)])
+        i += 1
+
+
+@scenario("login_storm")
+async def login_storm(bench: Bench) -> dict:
+    # --logins sign-ins across --storm-users accounts at --concurrency while
+    # one client keeps reading; the reader's latency (p50/p95 here, idle_*
+    # before the storm) should stay flat
+    users = [f"storm-{i}@example.com" for i in range(bench.args.storm_users)]
+    for email in users:
+        response = await bench.client.post(
+            "/api/auth/register", json={"email": email, "password": "storm-password", "full_name": "Storm"}
+        )
+        if response.status_code not in (200, 400):
+            response.raise_for_status()
+
+    idle: dict = {}
+    with bench.measure(idle):
+        await _probe(bench, asyncio.Event(), count=bench.args.reads // 2)
+
+    login_latencies = []
+    rejected = 0
+
+    async def login(i: int):
+        nonlocal rejected
+        started = time.perf_counter()
+        response = await bench.client.post(
+            "/api/auth/login", json={"email": users[i % len(users)], "password": "storm-password"}
+        )
+        if response.status_code == 503:
+            rejected += 1
+        elif response.status_code == 200:
+            login_latencies.append(time.perf_counter() - started)
+
+    results: dict = {}
+    stop = asyncio.Event()
+    with bench.measure(results):
+        prober = asyncio.create_task(_probe(bench, stop))
+        storm_started = time.perf_counter()
+        await bench.run_concurrently(
+            [lambda i=i: login(i) for i in range(bench.args.logins)], bench.args.concurrency
+        )
+        storm_wall = time.perf_counter() - storm_started
+        stop.set()
+        await prober
+    results.update({f"idle_{k}": idle[k] for k in ("p50_ms", "p95_ms", "p99_ms")})
+    results.update(latency_stats("login_", login_latencies))
+    results["logins_per_s"] = round(len(login_latencies) / storm_wall, 2)
+    results["login_rejected"] = rejected
+    return results
+
+
+async def _loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.01) -> None:
+    # How late a 10 ms sleep wakes up: time the event loop spent blocked
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def _data_layer_run(bench: Bench, call, calls: int, concurrency: int) -> dict:
+    latencies = []
+    lags: list = []
+
+    async def one():
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_loop_lag(stop, lags))
+    started = time.perf_counter()
+    await bench.run_concurrently([one] * calls, concurrency)
+    wall = time.perf_counter() - started
+    stop.set()
+    await ticker
+    return {
+        **latency_stats("", latencies),
+        "ops_per_s": round(len(latencies) / wall, 2),
+        "loop_lag_p95_ms": latency_stats("", lags)["p95_ms"],
+    }
+
+
+@scenario("data_layer")
+async def data_layer(bench: Bench) -> dict:
+    # The review list query issued in-process, many at once: the old path
+    # (sync session on Starlette's 40-thread pool, as sync handlers ran) vs.
+    # the async session. Run from the harness loop, so loop lag is what the
+    # app's loop would see from the same traffic. Pooled asyncio connections
+    # belong to the loop that opened them, so the async path gets its own
+    # engine here rather than sharing the app's.
+    from fastapi.concurrency import run_in_threadpool
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from app import database
+    from app.database import run_with_session
+    from app.services import review_service
+
+    url = database.async_database_url(bench.database_url)
+    async_engine = create_async_engine(url, **database.engine_options(url))
+    database.tune_sqlite(async_engine.sync_engine)
+    sessions = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def run_with_async_session(fn, *args):
+        async with sessions() as db:
+            return await db.run_sync(fn, *args)
+
+    missing = min(bench.args.dashboard_rows, 5000) - bench.review_count()
+    if missing > 0:
+        await asyncio.to_thread(bench.seed_reviews, missing)
+    calls = bench.args.reads * 2
+    concurrency = bench.args.concurrency * 5
+
+    results: dict = {}
+    paths = {
+        "sync": lambda: run_in_threadpool(run_with_session, review_service.list_items, [], 50),
+        "async": lambda: run_with_async_session(review_service.list_items, [], 50),
+    }
+    for name, call in paths.items():
+        await call()  # warm the pool
+        for key, value in (await _data_layer_run(bench, call, calls, concurrency)).items():
+            results[f"{name}_{key}"] = value
+    await async_engine.dispose()
+    results["calls"] = calls
+    return results
+
+
+def _contention_run(profile: str, begin: str, seconds: float, writers: int, readers: int) -> dict:
+    # Writers run import-shaped transactions (read, then insert a batch and
+    # commit) while readers aggregate, on a fresh SQLite file per run. The
+    # read is inside the transaction: BEGIN DEFERRED takes the write lock
+    # only at the insert, BEGIN IMMEDIATE takes it up front. One pooled
+    # connection per thread so every thread is actually in the database.
+    from sqlalchemy import create_engine, func, insert, select
+    from sqlalchemy.exc import DBAPIError, OperationalError
+    from app import database, models
+    from app.config import settings
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-contention-"), "contention.db")
+    url = f"sqlite:///{path}"
+    previous, settings.DB_PROFILE = settings.DB_PROFILE, profile
+    try:
+        engine = create_engine(
+            url, **{**database.engine_options(url), "pool_size": writers + readers, "max_overflow": 0}
+        )
+        database.tune_sqlite(engine)
+    finally:
+        settings.DB_PROFILE = previous
+    database.Base.metadata.create_all(engine)
+    # Each writer imports as its own user (foreign keys are enforced)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": w, "email": f"writer{w}@bench.local", "hashed_password": "-"} for w in range(writers)
+        ])
+
+    counts = {"commits": 0, "reads": 0, "locked": 0, "other_errors": 0}
+    commit_latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def bump(key: str, latency: Optional[float] = None) -> None:
+        with lock:
+            counts[key] += 1
+            if latency is not None:
+                commit_latencies.append(latency)
+
+    def write(worker: int) -> None:
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(f"BEGIN {begin}")
+                    conn.execute(select(func.count(models.Review.id)).where(models.Review.user_id == worker))
+                    conn.execute(insert(models.Review), [
+                        {"user_id": worker, "content_type": "blog", "original_content": f"w{worker} {i} {j}",
+                         "status": "pending"}
+                        for j in range(20)
+                    ])
+                bump("commits", time.perf_counter() - started)
+            except OperationalError as e:
+                bump("locked" if "locked" in str(e) or "busy" in str(e) else "other_errors")
+            except DBAPIError:
+                bump("other_errors")
+            i += 1
+
+    def read() -> None:
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(
+                        select(models.Review.status, func.count()).group_by(models.Review.status)
+                    ).all()
+                bump("reads")
+            except OperationalError:
+                bump("locked")
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {
+        "commits_per_s": round(counts["commits"] / seconds, 2),
+        "reads_per_s": round(counts["reads"] / seconds, 2),
+        "lock_errors": counts["locked"],
+        "other_errors": counts["other_errors"],
+        **latency_stats("commit_", commit_latencies),
+    }
+
+
+@scenario("sqlite_contention")
+async def sqlite_contention(bench: Bench) -> dict:
+    # Lock errors and write throughput with driver defaults vs. the tuned
+    # profile (WAL, synchronous=NORMAL, busy_timeout, ...), for deferred and
+    # immediate write transactions. SQLite only.
+    if not bench.database_url.startswith("sqlite"):
+        return {"skipped": "needs SQLite"}
+    results: dict = {}
+    for profile in ("default", "tuned"):
+        for begin in ("deferred", "immediate"):
+            numbers = await asyncio.to_thread(
+                _contention_run, profile, begin.upper(), bench.args.contention_seconds, bench.args.concurrency, 4
+            )
+            results.update({f"{profile}_{begin}_{key}": value for key, value in numbers.items()})
+    return results
@@ -0,0 +1,59 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from app.config import settings
+from app.database import Base
+from app import models  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logging", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def _url() -> str:
+    return config.attributes.get("database_url") or settings.DATABASE_URL
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    # Search objects from 0004 are dialect-specific and not in the models
+    if type_ == "table" and name.startswith("reviews_fts"):
+        return False
+    if name in ("search_vector", "ix_reviews_search_vector"):
+        return False
+    return True
+
+
+def _options(url: str) -> dict:
+    # SQLite can't ALTER most things in place; batch mode rebuilds the table
+    return {
+        "render_as_batch": url.startswith("sqlite"),
+        "compare_type": True,
+        "include_object": include_object,
+    }
+
+
+def run_migrations_offline() -> None:
+    url = _url()
+    context.configure(
+        url=url, target_metadata=target_metadata, literal_binds=True, **_options(url)
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    url = _url()
+    connectable = create_engine(url)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, **_options(url))
+        with context.begin_transaction():
+            context.run_migrations()
+    connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
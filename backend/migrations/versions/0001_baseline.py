@@ -0,0 +1,77 @@
+"""Baseline: the schema create_all produced before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "brand_guidelines",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+    )
+    op.create_index("ix_brand_guidelines_id", "brand_guidelines", ["id"])
+
+    op.create_table(
+        "reviews",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=False),
+        sa.Column("original_content", sa.Text(), nullable=False),
+        sa.Column("source", sa.String(), nullable=True),
+        sa.Column("source_reference", sa.String(), nullable=True),
+        sa.Column("brand_score", sa.Float(), nullable=True),
+        sa.Column("brand_feedback", sa.Text(), nullable=True),
+        sa.Column("compliance_flags", sa.JSON(), nullable=True),
+        sa.Column("sentiment", sa.String(), nullable=True),
+        sa.Column("sentiment_score", sa.Float(), nullable=True),
+        sa.Column("sentiment_feedback", sa.Text(), nullable=True),
+        sa.Column("suggested_rewrite", sa.Text(), nullable=True),
+        sa.Column("overall_rating", sa.String(), nullable=True),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_reviews_id", "reviews", ["id"])
+
+    op.create_table(
+        "integration_configs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("platform", sa.String(), nullable=False),
+        sa.Column("config", sa.JSON(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_integration_configs_id", "integration_configs", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("integration_configs")
+    op.drop_table("reviews")
+    op.drop_table("brand_guidelines")
+    op.drop_table("users")
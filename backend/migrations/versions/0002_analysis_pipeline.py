@@ -0,0 +1,113 @@
+"""Analysis pipeline: job queue, Message Batches, result cache, routing and usage
+
+Everything added to the models since the baseline. Existing guidelines get
+version 1 and existing users normal priority.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+REVIEW_COLUMNS = [
+    ("content_hash", sa.String(64)),
+    ("import_id", sa.String(32)),
+    ("guidelines_version", sa.Integer()),
+    ("analysis_model", sa.String()),
+    ("analysis_route", sa.String()),
+    ("analysis_latency_ms", sa.Integer()),
+    ("analysis_escalated", sa.Boolean()),
+    ("input_tokens", sa.Integer()),
+    ("output_tokens", sa.Integer()),
+    ("cache_read_input_tokens", sa.Integer()),
+    ("cache_creation_input_tokens", sa.Integer()),
+]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("priority", sa.String(), nullable=True, server_default="normal"))
+
+    with op.batch_alter_table("brand_guidelines") as batch:
+        batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+    op.create_table(
+        "analysis_batches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("provider_batch_id", sa.String(), nullable=False, unique=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("request_count", sa.Integer(), nullable=True),
+        sa.Column("guidelines_version", sa.Integer(), nullable=True),
+        sa.Column("guidelines_digest", sa.String(64), nullable=True),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("ended_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_analysis_batches_id", "analysis_batches", ["id"])
+    op.create_index("ix_analysis_batches_status", "analysis_batches", ["status"])
+
+    with op.batch_alter_table("reviews") as batch:
+        for name, type_ in REVIEW_COLUMNS:
+            batch.add_column(sa.Column(name, type_, nullable=True))
+        batch.add_column(sa.Column("batch_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_reviews_batch_id", "analysis_batches", ["batch_id"], ["id"])
+    op.create_index("ix_reviews_import_id", "reviews", ["import_id"])
+    op.create_index("ix_reviews_user_id_created_at_id", "reviews", ["user_id", "created_at", "id"])
+
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "review_id", sa.Integer(), sa.ForeignKey("reviews.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("bypass_cache", sa.Boolean(), nullable=True),
+        sa.Column("priority", sa.Integer(), nullable=True),
+        sa.Column("available_at", sa.DateTime(), nullable=True),
+        sa.Column("worker_id", sa.String(), nullable=True),
+        sa.Column("lease_token", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_analysis_jobs_id", "analysis_jobs", ["id"])
+    op.create_index("ix_analysis_jobs_review_id", "analysis_jobs", ["review_id"])
+    op.create_index("ix_analysis_jobs_status", "analysis_jobs", ["status"])
+
+    op.create_table(
+        "analysis_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("last_used_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_analysis_cache_created_at", "analysis_cache", ["created_at"])
+    op.create_index("ix_analysis_cache_last_used_at", "analysis_cache", ["last_used_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("analysis_cache")
+    op.drop_table("analysis_jobs")
+    op.drop_index("ix_reviews_user_id_created_at_id", table_name="reviews")
+    op.drop_index("ix_reviews_import_id", table_name="reviews")
+    with op.batch_alter_table("reviews") as batch:
+        batch.drop_constraint("fk_reviews_batch_id", type_="foreignkey")
+        batch.drop_column("batch_id")
+        for name, _ in reversed(REVIEW_COLUMNS):
+            batch.drop_column(name)
+    op.drop_table("analysis_batches")
+    with op.batch_alter_table("brand_guidelines") as batch:
+        batch.drop_column("version")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("priority")
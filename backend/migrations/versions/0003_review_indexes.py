@@ -0,0 +1,52 @@
+"""Indexes for the review queries the routers and worker actually run
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("status = 'pending'")
+
+# name -> (columns, extra create_index kwargs). (user_id, created_at, id)
+# from 0002 already covers a user's list and dashboard scope.
+INDEXES = {
+    # Admin list / keyset pagination and the dashboard's "this week" count
+    "ix_reviews_created_at_id": (["created_at", "id"], {}),
+    # Dashboard aggregates over completed reviews
+    "ix_reviews_status_created_at": (["status", "created_at"], {}),
+    # Slack/Notion de-duplication on import
+    "ix_reviews_source_source_reference": (["source", "source_reference"], {}),
+    # Content type distribution
+    "ix_reviews_content_type": (["content_type"], {}),
+    # Startup requeue and batch collection look only at pending reviews,
+    # a small fraction of the table
+    "ix_reviews_pending_created_at": (
+        ["created_at"], {"postgresql_where": PENDING, "sqlite_where": PENDING},
+    ),
+}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY keeps reviews writable while the indexes build; it
+        # can't run inside the migration transaction
+        with op.get_context().autocommit_block():
+            for name, (columns, kwargs) in INDEXES.items():
+                op.create_index(
+                    name, "reviews", columns, postgresql_concurrently=True, if_not_exists=True, **kwargs
+                )
+        return
+    for name, (columns, kwargs) in INDEXES.items():
+        op.create_index(name, "reviews", columns, **kwargs)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="reviews")
@@ -0,0 +1,127 @@
+"""Full-text search over completed reviews
+
+SQLite: an FTS5 table keyed by review id. PostgreSQL: a weighted tsvector
+column with a GIN index. Both are kept current by triggers as reviews
+complete, change or are deleted, and are backfilled here.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Searchable text of the compliance flags (their quoted text and issue)
+SQLITE_FLAGS = """(
+    SELECT group_concat(
+        coalesce(json_extract(f.value, '$.text'), '') || ' ' || coalesce(json_extract(f.value, '$.issue'), ''),
+        ' '
+    )
+    FROM json_each(CASE WHEN json_valid({row}.compliance_flags) THEN {row}.compliance_flags ELSE '[]' END) AS f
+)"""
+
+SQLITE_COLUMNS = "rowid, original_content, summary, brand_feedback, flags"
+
+
+def _sqlite_values(row: str) -> str:
+    return (
+        f"{row}.id, {row}.original_content, {row}.summary, {row}.brand_feedback, "
+        + SQLITE_FLAGS.format(row=row)
+    )
+
+
+def _upgrade_sqlite() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE reviews_fts USING fts5("
+        "original_content, summary, brand_feedback, flags, "
+        "tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    op.execute(f"""
+        CREATE TRIGGER reviews_fts_insert AFTER INSERT ON reviews
+        WHEN NEW.status = 'completed'
+        BEGIN
+            INSERT INTO reviews_fts ({SQLITE_COLUMNS}) VALUES ({_sqlite_values("NEW")});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER reviews_fts_update
+        AFTER UPDATE OF status, original_content, summary, brand_feedback, compliance_flags ON reviews
+        BEGIN
+            DELETE FROM reviews_fts WHERE rowid = OLD.id;
+            INSERT INTO reviews_fts ({SQLITE_COLUMNS})
+            SELECT {_sqlite_values("NEW")} WHERE NEW.status = 'completed';
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER reviews_fts_delete AFTER DELETE ON reviews
+        BEGIN
+            DELETE FROM reviews_fts WHERE rowid = OLD.id;
+        END
+    """)
+    op.execute(f"""
+        INSERT INTO reviews_fts ({SQLITE_COLUMNS})
+        SELECT {_sqlite_values("reviews")} FROM reviews WHERE reviews.status = 'completed'
+    """)
+
+
+def _upgrade_postgresql() -> None:
+    op.execute("ALTER TABLE reviews ADD COLUMN search_vector tsvector")
+    op.execute("""
+        CREATE FUNCTION reviews_search_vector() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.status = 'completed' THEN
+                NEW.search_vector :=
+                    setweight(to_tsvector('english', coalesce(NEW.summary, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(NEW.original_content, '')), 'B') ||
+                    setweight(to_tsvector('english', coalesce(NEW.brand_feedback, '')), 'C') ||
+                    setweight(to_tsvector('english', coalesce((
+                        SELECT string_agg(concat_ws(' ', f ->> 'text', f ->> 'issue'), ' ')
+                        FROM json_array_elements(
+                            CASE WHEN json_typeof(NEW.compliance_flags) = 'array'
+                                 THEN NEW.compliance_flags ELSE '[]'::json END
+                        ) AS f
+                    ), '')), 'C');
+            ELSE
+                NEW.search_vector := NULL;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER reviews_search_vector_update
+        BEFORE INSERT OR UPDATE OF status, original_content, summary, brand_feedback, compliance_flags
+        ON reviews FOR EACH ROW EXECUTE FUNCTION reviews_search_vector()
+    """)
+    # Setting status to itself fires the trigger for the backfill
+    op.execute("UPDATE reviews SET status = status WHERE status = 'completed'")
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reviews_search_vector "
+            "ON reviews USING gin (search_vector)"
+        )
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        _upgrade_sqlite()
+    elif dialect == "postgresql":
+        _upgrade_postgresql()
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for trigger in ("reviews_fts_insert", "reviews_fts_update", "reviews_fts_delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS reviews_fts")
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_reviews_search_vector")
+        op.execute("DROP TRIGGER IF EXISTS reviews_search_vector_update ON reviews")
+        op.execute("DROP FUNCTION IF EXISTS reviews_search_vector()")
+        op.execute("ALTER TABLE reviews DROP COLUMN IF EXISTS search_vector")
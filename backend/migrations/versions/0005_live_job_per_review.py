@@ -0,0 +1,35 @@
+"""At most one live (queued or running) analysis job per review
+
+Workers starting together could each requeue the same pending reviews.
+Extra live jobs already in the table are marked failed before the partial
+unique index is built.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text("status IN ('queued', 'running')")
+INDEX = "uq_analysis_jobs_live_review_id"
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE analysis_jobs SET status = 'failed', lease_token = NULL, last_error = 'Duplicate job' "
+        "WHERE status IN ('queued', 'running') AND id NOT IN ("
+        "SELECT min(id) FROM analysis_jobs WHERE status IN ('queued', 'running') GROUP BY review_id)"
+    )
+    op.create_index(
+        INDEX, "analysis_jobs", ["review_id"], unique=True, postgresql_where=LIVE, sqlite_where=LIVE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX, table_name="analysis_jobs")